@@ -4,6 +4,15 @@ from routes.energy_prediction import energy_prediction_bp
 from routes.optimize import optimize_bp
 from routes.update_states import update_states_bp
 from routes.auth import auth_bp
+from routes.correct_states import correct_states_bp
+from routes.history import history_bp
+from routes.precomputed import precomputed_bp
+from routes.trees import trees_bp
+from routes.energy_prediction import prediction_cache
+from db.users import ensure_indexes, user_cache
+from db.precomputed import ensure_precomputed_indexes
+from db.connection import state_writes
+from utils import metrics
 
 app = Flask(__name__)
 CORS(app)  
@@ -13,6 +22,28 @@ app.register_blueprint(energy_prediction_bp)
 app.register_blueprint(optimize_bp)
 app.register_blueprint(update_states_bp)
 app.register_blueprint(auth_bp, url_prefix="/api")
+app.register_blueprint(correct_states_bp)
+app.register_blueprint(history_bp)
+app.register_blueprint(precomputed_bp)
+app.register_blueprint(trees_bp)
 
+# Request latency histograms, stage timers and /metrics
+metrics.init_app(app)
+metrics.register_sample("fam_prediction_cache_hits_total", "counter", "Prediction cache hits.", lambda: prediction_cache.hits)
+metrics.register_sample("fam_prediction_cache_misses_total", "counter", "Prediction cache misses.", lambda: prediction_cache.misses)
+metrics.register_sample("fam_user_cache_hits_total", "counter", "User record cache hits.", lambda: user_cache.hits)
+metrics.register_sample("fam_user_cache_misses_total", "counter", "User record cache misses.", lambda: user_cache.misses)
+metrics.register_sample("fam_write_behind_pending", "gauge", "Appliance-state updates waiting to be flushed.", state_writes.pending_count)
+metrics.register_sample("fam_write_behind_flushed_total", "counter", "Appliance-state updates written to Mongo.", lambda: state_writes.stats["flushed"])
+metrics.register_sample("fam_write_behind_rejected_total", "counter", "Appliance-state updates rejected because the buffer was full.", lambda: state_writes.stats["rejected"])
+
+# Unique index on user email, the (email, bucket_start) history index and the (region, date) index
+try:
+    ensure_indexes()
+    ensure_precomputed_indexes()
+except Exception as e:
+    print(f"❌ Error creating MongoDB indexes: {e}")
+
+# Development server; serve.py is the multi-process production entry point
 if __name__ == "__main__":
     app.run(debug=True, port=9000)
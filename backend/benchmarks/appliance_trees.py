@@ -0,0 +1,46 @@
+# Parity check and latency comparison between sklearn's MultiOutputClassifier and the flattened trees.
+# Run from backend/: python -m benchmarks.appliance_trees
+import timeit
+import numpy as np
+import pandas as pd
+from ml.appliance_model import get_appliance_model, features
+
+# Random conditions in feature order: Day, Month, Hour, Temperature, Humidity, WindSpeed
+def synthetic_conditions(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(1, 29, rows),
+        rng.integers(1, 13, rows),
+        rng.integers(0, 24, rows),
+        rng.uniform(0, 45, rows),
+        rng.uniform(5, 100, rows),
+        rng.uniform(0, 6, rows)
+    ])
+
+def main():
+    artifact = get_appliance_model()
+    model, evaluator = artifact['model'], artifact['evaluator']
+
+    X = synthetic_conditions(100000)
+    expected = model.predict(pd.DataFrame(X, columns=features))
+    assert (evaluator.predict_batch(X) == expected).all(), "flattened trees diverge from sklearn (batch)"
+    assert all(list(evaluator.predict(X[i]).values()) == expected[i].tolist() for i in range(1000)), \
+        "flattened trees diverge from sklearn (single row)"
+    print(f"Parity: {len(X)} rows identical")
+
+    # The old /optimize path: one-row DataFrame plus MultiOutputClassifier.predict
+    repeat = 200
+    sklearn_time = min(timeit.repeat(lambda: model.predict(pd.DataFrame(X[:1], columns=features)), number=repeat, repeat=5)) / repeat
+    flat_time = min(timeit.repeat(lambda: evaluator.predict(X[0]), number=repeat, repeat=5)) / repeat
+    print(f"     1 row : sklearn {sklearn_time * 1e6:10.1f} us | flat {flat_time * 1e6:8.1f} us | speedup {sklearn_time / flat_time:7.1f}x")
+
+    for rows in [100, 100000]:
+        batch, frame = X[:rows], pd.DataFrame(X[:rows], columns=features)
+        repeat = max(1, 20000 // rows)
+        sklearn_time = min(timeit.repeat(lambda: model.predict(frame), number=repeat, repeat=5)) / repeat
+        flat_time = min(timeit.repeat(lambda: evaluator.predict_batch(batch), number=repeat, repeat=5)) / repeat
+        print(f"{rows:>6} rows: sklearn {sklearn_time / rows * 1e6:8.2f} us/row | flat {flat_time / rows * 1e6:8.2f} us/row | "
+              f"speedup {sklearn_time / flat_time:5.1f}x")
+
+if __name__ == "__main__":
+    main()
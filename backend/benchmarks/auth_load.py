@@ -0,0 +1,98 @@
+# Predict latency while a login storm is running, with password hashing inline vs in the worker pool.
+# Run from backend/: python -m benchmarks.auth_load [--login-threads 8] [--predict-threads 4] [--seconds 5]
+# Users live in an in-memory mongomock collection; requests go through the Flask test client.
+import argparse
+import threading
+import time
+import numpy as np
+import mongomock
+from werkzeug.security import generate_password_hash
+import db.connection
+
+client = mongomock.MongoClient()
+users = client["FAM_bench"]["Users"]
+db.connection.users_collection = users
+db.connection.history_collection = client["FAM_bench"]["ApplianceHistory"]
+db.connection.precomputed_collection = client["FAM_bench"]["RegionForecasts"]
+db.connection.precompute_runs_collection = client["FAM_bench"]["PrecomputeRuns"]
+db.connection.state_writes.collection = users
+db.connection.state_writes.history_collection = db.connection.history_collection
+
+import db.users
+import routes.auth
+from app import app
+from utils.password_pool import HashingPool
+from utils.session_tokens import issue_token, verify_token
+
+forecast = {"temperatures": [20.0] * 24, "humidities": [50.0] * 24, "winds": [10.0] * 24}
+
+def seed(count):
+    users.delete_many({})
+    password = generate_password_hash("secret")
+    users.insert_many([{"email": f"user{i}@fam.io", "password": password, "firstName": "A", "lastName": "B", "gender": "x",
+                        "TV": 0, "AC": 0, "Fridge": 0, "Oven": 0, "Fan": 0, "Light": 0, "Total": 0} for i in range(count)])
+    db.users.ensure_indexes()
+
+def run_mixed(args, hash_workers):
+    routes.auth.password_pool = HashingPool(hash_workers, args.queue_depth)
+    routes.auth.password_pool.warm()
+    db.users.user_cache.clear()
+    token = issue_token("user0@fam.io")
+    stop = threading.Event()
+    predict_latencies, login_status = [], {}
+    lock = threading.Lock()
+
+    def login_client(offset):
+        client = app.test_client()
+        i = offset
+        while not stop.is_set():
+            status = client.post("/api/login", json={"email": f"user{i % args.users}@fam.io", "password": "secret"}).status_code
+            with lock:
+                login_status[status] = login_status.get(status, 0) + 1
+            i += args.login_threads
+
+    def predict_client():
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.post("/predict_energy_consumption", json=forecast, headers=headers)
+            with lock:
+                predict_latencies.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=login_client, args=(t,)) for t in range(args.login_threads)]
+    workers += [threading.Thread(target=predict_client) for _ in range(args.predict_threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    latencies = np.array(predict_latencies) * 1000
+    label = f"{hash_workers} hash workers" if hash_workers else "inline hashing"
+    print(f"{label:>18}: predict p50 {np.percentile(latencies, 50):7.2f} ms  p99 {np.percentile(latencies, 99):7.2f} ms  "
+          f"{len(latencies) / args.seconds:7.1f} req/s | logins {dict(sorted(login_status.items()))}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--login-threads', type=int, default=8)
+    parser.add_argument('--predict-threads', type=int, default=4)
+    parser.add_argument('--hash-workers', type=int, default=2)
+    parser.add_argument('--queue-depth', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+    seed(args.users)
+
+    token = issue_token("user0@fam.io")
+    start = time.perf_counter()
+    for _ in range(10000):
+        verify_token(token)
+    print(f"🔑 verify_token: {(time.perf_counter() - start) / 10000 * 1e6:.1f} µs per request")
+
+    run_mixed(args, 0)
+    run_mixed(args, args.hash_workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Parity check and latency comparison between the sklearn pipeline and the compiled predictor.
+# Run from backend/: python -m benchmarks.compiled_predictor
+import pickle
+import timeit
+import numpy as np
+from datetime import datetime
+from ml.bayesian import compile_predictor, predict_compiled, predict_std_compiled
+from ml.features import build_features, forecast_timestamps
+
+def load_pipeline():
+    with open('models/poly.pkl', 'rb') as f:
+        poly = pickle.load(f)
+    with open('models/scaler.pkl', 'rb') as f:
+        scaler = pickle.load(f)
+    with open('models/bayesian_model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    return poly, scaler, model
+
+# Random but plausible forecasts for `homes` homes over 24 hours
+def synthetic_features(homes, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = homes * 24
+    return build_features(
+        rng.uniform(0, 40, rows),
+        rng.uniform(10, 95, rows),
+        rng.uniform(0, 6, rows),
+        forecast_timestamps(datetime(2024, 7, 1), [24] * homes)
+    )
+
+def main():
+    poly, scaler, model = load_pipeline()
+    compiled = compile_predictor(poly, scaler, model)
+
+    def sklearn_predict(X):
+        return model.predict(scaler.transform(poly.transform(X)))
+
+    X = synthetic_features(1000)
+    max_error = np.abs(sklearn_predict(X) - predict_compiled(compiled, X)).max()
+    print(f"Parity: max abs difference over {len(X)} rows = {max_error:.3e}")
+    assert max_error < 1e-6, "compiled predictor diverges from the sklearn pipeline"
+
+    def sklearn_std(X):
+        return model.predict(scaler.transform(poly.transform(X)), return_std=True)[1]
+
+    max_error = np.abs(sklearn_std(X) - predict_std_compiled(compiled, X)).max()
+    print(f"Parity: max abs std difference over {len(X)} rows = {max_error:.3e}")
+    assert max_error < 1e-6, "compiled predictive std diverges from the sklearn pipeline"
+
+    for rows in [1, 24, 24 * 1000]:
+        batch = X[:rows]
+        repeat = max(1, 20000 // rows)
+        sklearn_time = min(timeit.repeat(lambda: sklearn_predict(batch), number=repeat, repeat=5)) / repeat
+        compiled_time = min(timeit.repeat(lambda: predict_compiled(compiled, batch), number=repeat, repeat=5)) / repeat
+        print(f"{rows:>6} rows: sklearn {sklearn_time * 1e6:10.1f} us ({sklearn_time / rows * 1e6:7.2f} us/row) | "
+              f"compiled {compiled_time * 1e6:10.1f} us ({compiled_time / rows * 1e6:7.2f} us/row) | "
+              f"speedup {sklearn_time / compiled_time:5.1f}x")
+
+    # Point prediction plus std: sklearn's return_std path against the cached Cholesky factor
+    for rows in [24, 24 * 1000]:
+        batch = X[:rows]
+        repeat = max(1, 20000 // rows)
+        sklearn_time = min(timeit.repeat(lambda: sklearn_std(batch), number=repeat, repeat=5)) / repeat
+        compiled_time = min(timeit.repeat(lambda: (predict_compiled(compiled, batch), predict_std_compiled(compiled, batch)), number=repeat, repeat=5)) / repeat
+        print(f"{rows:>6} rows with std: sklearn {sklearn_time * 1e6:10.1f} us | compiled {compiled_time * 1e6:10.1f} us | "
+              f"speedup {sklearn_time / compiled_time:5.1f}x")
+
+if __name__ == "__main__":
+    main()
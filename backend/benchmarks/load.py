@@ -0,0 +1,188 @@
+# Load generator for the Flask backend. Clients at a fixed concurrency send a weighted mix of
+# /predict_energy_consumption, /optimize, /update and /api/login over HTTP and report per-route
+# p50/p95/p99 latency and throughput.
+# Run from backend/: python -m benchmarks.load [--concurrency 16] [--duration 10] [--mix predict=4,optimize=3,update=2,login=1]
+# By default the app is served in-process on a threaded werkzeug server with mongomock standing in
+# for MongoDB; --url points the generator at an already running server instead (e.g. serve.py).
+import argparse
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from benchmarks.report import latency_summary, save_results
+
+routes = {
+    'predict': '/predict_energy_consumption',
+    'optimize': '/optimize',
+    'update': '/update',
+    'login': '/api/login'
+}
+
+def start_local_server():
+    import mongomock
+    import db.connection
+    client = mongomock.MongoClient()
+    db.connection.users_collection = client['FAM_bench']['Users']
+    db.connection.history_collection = client['FAM_bench']['ApplianceHistory']
+    db.connection.precomputed_collection = client['FAM_bench']['RegionForecasts']
+    db.connection.precompute_runs_collection = client['FAM_bench']['PrecomputeRuns']
+    db.connection.state_writes.collection = db.connection.users_collection
+    db.connection.state_writes.history_collection = db.connection.history_collection
+
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+class Client:
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        self.headers = {'Content-Type': 'application/json'}
+
+    def post(self, path, body):
+        self.conn.request('POST', path, body=json.dumps(body), headers=self.headers)
+        response = self.conn.getresponse()
+        return response.status, response.read()
+
+# Request bodies: a pool of distinct city forecasts (so the prediction cache sees realistic reuse),
+# random optimizer conditions and random appliance states
+def make_payloads(args, rng):
+    forecasts = [{
+        'temperatures': [round(rng.uniform(0, 40), 1) for _ in range(24)],
+        'humidities': [round(rng.uniform(10, 95), 1) for _ in range(24)],
+        'winds': [round(rng.uniform(0, 30), 1) for _ in range(24)]
+    } for _ in range(args.forecasts)]
+
+    def payload(kind, user):
+        if kind == 'predict':
+            return rng.choice(forecasts)
+        if kind == 'optimize':
+            return {'Day': rng.randint(1, 28), 'Month': rng.randint(1, 12), 'Hour': rng.randint(0, 23),
+                    'Temperature': round(rng.uniform(0, 45), 1), 'Humidity': round(rng.uniform(5, 100), 1),
+                    'WindSpeed': round(rng.uniform(0, 6), 1), 'current_states': {'TV': 1, 'AC': 0, 'Fridge': 1}}
+        if kind == 'update':
+            return {'email': user, 'appliances': [rng.randint(0, 1) for _ in range(6)], 'total': rng.randint(0, 5000)}
+        return {'email': user, 'password': args.password}
+    return payload
+
+# Sign up every benchmark user (409s from earlier runs are fine) and log each one in for a token
+def seed_users(args):
+    emails = [f"bench{i}@fam.io" for i in range(args.users)]
+
+    def signup_and_login(email):
+        client = Client(args.url)
+        client.post('/api/signup', {'email': email, 'password': args.password, 'firstName': 'Bench', 'lastName': 'User', 'gender': 'x'})
+        for _ in range(20):
+            status, body = client.post('/api/login', {'email': email, 'password': args.password})
+            if status == 200:
+                return email, json.loads(body).get('token')
+            time.sleep(0.2)  # hashing pool saturated by the other signups
+        raise RuntimeError(f"could not log in {email} (status {status})")
+
+    with ThreadPoolExecutor(8) as pool:
+        return list(pool.map(signup_and_login, emails))
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        kind, weight = part.split('=')
+        if kind not in routes:
+            raise argparse.ArgumentTypeError(f"unknown route {kind}; choose from {', '.join(routes)}")
+        mix[kind] = float(weight)
+    return mix
+
+def run(args, sessions):
+    stop_at = time.perf_counter() + args.warmup + args.duration
+    measure_from = time.perf_counter() + args.warmup
+    latencies = {kind: [] for kind in args.mix}
+    statuses = {kind: {} for kind in args.mix}
+    errors = {kind: 0 for kind in args.mix}
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        payload = make_payloads(args, rng)
+        email, token = sessions[index % len(sessions)]
+
+        def connect():
+            client = Client(args.url)
+            if token:
+                client.headers['Authorization'] = f"Bearer {token}"
+            return client
+
+        client = connect()
+        kinds, weights = list(args.mix), list(args.mix.values())
+        while True:
+            kind = rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            try:
+                status, _ = client.post(routes[kind], payload(kind, email))
+            except (OSError, http.client.HTTPException):
+                client = connect()
+                status = None
+            elapsed = time.perf_counter() - start
+            if start < measure_from:
+                continue
+            with lock:
+                if status is None:
+                    errors[kind] += 1
+                else:
+                    latencies[kind].append(elapsed)
+                    statuses[kind][str(status)] = statuses[kind].get(str(status), 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {}
+    for kind in args.mix:
+        results[kind] = {**latency_summary(latencies[kind]), 'throughput_rps': len(latencies[kind]) / args.duration,
+                         'statuses': statuses[kind], 'errors': errors[kind]}
+    everything = [latency for kind in args.mix for latency in latencies[kind]]
+    results['total'] = {**latency_summary(everything), 'throughput_rps': len(everything) / args.duration}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='benchmark a running server instead of an in-process one')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('predict=4,optimize=3,update=2,login=1'))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--forecasts', type=int, default=50, help='distinct forecasts in the predict pool')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='results file (default benchmarks/results/load-<commit>.json)')
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        server, args.url = start_local_server()
+    sessions = seed_users(args)
+    print(f"🚀 {args.concurrency} clients for {args.duration:g}s against {args.url}")
+
+    results = run(args, sessions)
+    for kind, summary in results.items():
+        if summary.get('count'):
+            print(f"{kind:<9} {summary['throughput_rps']:8.1f} req/s | p50 {summary['p50_ms']:8.2f} ms | p95 {summary['p95_ms']:8.2f} ms | "
+                  f"p99 {summary['p99_ms']:8.2f} ms | {summary.get('statuses', '')}")
+
+    config = {**vars(args), 'url': None if server else args.url}
+    save_results('load', config, results, path=args.output)
+    if server:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
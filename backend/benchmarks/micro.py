@@ -0,0 +1,84 @@
+# Micro-benchmarks for the hot paths: feature construction, the sklearn and compiled energy
+# predictors, the appliance trees, and CSP labeling / online correction.
+# Run from backend/: python -m benchmarks.micro [--output PATH] [--only NAME ...]
+import argparse
+import timeit
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from ml.bayesian import compile_predictor, predict_compiled, predict_std_compiled
+from ml.features import build_features, forecast_timestamps
+from ml.appliance_model import get_appliance_model, features
+from ml.csp import label_states, correct_states, nearest_feasible_mask
+from benchmarks.compiled_predictor import load_pipeline, synthetic_features
+from benchmarks.appliance_trees import synthetic_conditions
+from benchmarks.csp_labeling import synthetic_frame
+from benchmarks.report import save_results
+
+# Per-call time in microseconds: best and median of `repeat` timing runs of ~`budget` seconds each
+def measure(fn, budget=0.2, repeat=5):
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * budget / max(elapsed, 1e-9)))
+    runs = np.array(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+    return {'best_us': float(runs.min()), 'median_us': float(np.median(runs)), 'calls': number}
+
+def energy_cases():
+    poly, scaler, model = load_pipeline()
+    compiled = compile_predictor(poly, scaler, model)
+    rng = np.random.default_rng(0)
+    weather = [rng.uniform(0, 40, 24), rng.uniform(10, 95, 24), rng.uniform(0, 6, 24)]
+    timestamps = forecast_timestamps(datetime(2024, 7, 1), [24])
+    day, thousand_homes = synthetic_features(1), synthetic_features(1000)
+    return {
+        'features_24h': lambda: build_features(*weather, timestamps),
+        'sklearn_predict_24h': lambda: model.predict(scaler.transform(poly.transform(day))),
+        'compiled_predict_24h': lambda: predict_compiled(compiled, day),
+        'compiled_std_24h': lambda: predict_std_compiled(compiled, day),
+        'compiled_predict_1000_homes': lambda: predict_compiled(compiled, thousand_homes)
+    }
+
+def tree_cases():
+    artifact = get_appliance_model()
+    model, evaluator = artifact['model'], artifact['evaluator']
+    X = synthetic_conditions(1000)
+    row = pd.DataFrame(X[:1], columns=features)
+    return {
+        'sklearn_tree_1_row': lambda: model.predict(row),
+        'flat_tree_1_row': lambda: evaluator.predict(X[0]),
+        'flat_tree_1000_rows': lambda: evaluator.predict_batch(X)
+    }
+
+def csp_cases():
+    frame = synthetic_frame(100000)
+    conditions = {'Temperature': 30.0, 'Humidity': 70.0, 'Hour': 19}
+    current = {'TV': 1, 'AC': 1, 'Fridge': 1, 'Oven': 1, 'Fan': 1, 'Light': 1}
+
+    def correct_uncached():
+        nearest_feasible_mask.cache_clear()
+        return correct_states(conditions, current)
+
+    return {
+        'csp_label_100k_rows': lambda: label_states(frame),
+        'csp_correct_cached': lambda: correct_states(conditions, current),
+        'csp_correct_uncached': correct_uncached
+    }
+
+groups = {'energy': energy_cases, 'trees': tree_cases, 'csp': csp_cases}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--only', nargs='+', choices=sorted(groups))
+    parser.add_argument('--budget', type=float, default=0.2, help='seconds per timing run')
+    parser.add_argument('--output', help='results file (default benchmarks/results/micro-<commit>.json)')
+    args = parser.parse_args()
+
+    results = {}
+    for group in args.only or groups:
+        for name, fn in groups[group]().items():
+            results[name] = measure(fn, budget=args.budget)
+            print(f"{name:<30} best {results[name]['best_us']:12.1f} us | median {results[name]['median_us']:12.1f} us")
+    save_results('micro', vars(args), results, path=args.output)
+
+if __name__ == '__main__':
+    main()
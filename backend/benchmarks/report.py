@@ -0,0 +1,77 @@
+# Shared result handling for the benchmark suite: latency summaries, JSON results tagged with the
+# commit they were measured on, and a comparison between two saved runs.
+# Compare from backend/: python -m benchmarks.report BASELINE.json CANDIDATE.json
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+results_dir = 'benchmarks/results'
+
+# p50/p95/p99/mean in milliseconds for a list of latencies in seconds
+def latency_summary(latencies):
+    values = np.asarray(latencies) * 1000
+    if len(values) == 0:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'count': int(len(values)), 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'mean_ms': float(values.mean())}
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+# Write {benchmark, commit, machine, config, results} to `path` (default benchmarks/results/<name>-<commit>.json)
+def save_results(name, config, results, path=None):
+    commit = git_commit()
+    if path is None:
+        os.makedirs(results_dir, exist_ok=True)
+        path = os.path.join(results_dir, f"{name}-{commit}.json")
+    document = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'config': config,
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"💾 Results saved to {path}")
+    return path
+
+# Flatten nested results into {"a.b.c": number}
+def _flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + '.'))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+def compare(baseline_path, candidate_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    if baseline['benchmark'] != candidate['benchmark']:
+        print(f"⚠️ Comparing different benchmarks: {baseline['benchmark']} vs {candidate['benchmark']}")
+
+    old, new = _flatten(baseline['results']), _flatten(candidate['results'])
+    print(f"{'metric':<58} {baseline['commit']:>14} {candidate['commit']:>14} {'change':>9}")
+    for name in sorted(old.keys() & new.keys()):
+        change = f"{(new[name] - old[name]) / old[name] * 100:+8.1f}%" if old[name] else ''
+        print(f"{name:<58} {old[name]:>14.3f} {new[name]:>14.3f} {change:>9}")
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m benchmarks.report BASELINE.json CANDIDATE.json")
+    compare(sys.argv[1], sys.argv[2])
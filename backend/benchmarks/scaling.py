@@ -0,0 +1,103 @@
+# Throughput of the pre-fork server (serve.py) as the worker count grows from 1 to the core count.
+# Run from backend/: python -m benchmarks.scaling [--workers 1 2 4] [--concurrency 32] [--duration 10]
+# mongomock stands in for MongoDB; users are seeded before the server forks, so every worker
+# inherits them (writes made by one worker stay in that worker's copy).
+import argparse
+import os
+import signal
+import socket
+import time
+from argparse import Namespace
+from werkzeug.security import generate_password_hash
+import mongomock
+import db.connection
+
+client = mongomock.MongoClient()
+db.connection.users_collection = client['FAM_bench']['Users']
+db.connection.history_collection = client['FAM_bench']['ApplianceHistory']
+db.connection.precomputed_collection = client['FAM_bench']['RegionForecasts']
+db.connection.precompute_runs_collection = client['FAM_bench']['PrecomputeRuns']
+db.connection.state_writes.collection = db.connection.users_collection
+db.connection.state_writes.history_collection = db.connection.history_collection
+
+from serve import load_app, serve
+from utils.session_tokens import issue_token
+from benchmarks.load import parse_mix, run
+from benchmarks.report import save_results
+
+appliances = ["TV", "AC", "Fridge", "Oven", "Fan", "Light"]
+
+def seed_users(count, password):
+    password_hash = generate_password_hash(password)
+    db.connection.users_collection.insert_many([
+        {"email": f"bench{i}@fam.io", "password": password_hash, "firstName": "Bench", "lastName": "User", "gender": "x",
+         **{appliance: 0 for appliance in appliances}, "Total": 0}
+        for i in range(count)
+    ])
+    return [(f"bench{i}@fam.io", issue_token(f"bench{i}@fam.io")) for i in range(count)]
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def default_worker_counts():
+    counts, workers = [], 1
+    while workers < (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return counts + [os.cpu_count() or 1]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=default_worker_counts())
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('predict=4,optimize=3,update=2,login=1'))
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--forecasts', type=int, default=50)
+    parser.add_argument('--output', help='results file (default benchmarks/results/scaling-<commit>.json)')
+    args = parser.parse_args()
+
+    password = 'bench-password'
+    sessions = seed_users(args.users, password)
+    app = load_app()
+
+    results = {}
+    for workers in args.workers:
+        port = free_port()
+        server_pid = os.fork()
+        if server_pid == 0:
+            serve(app, '127.0.0.1', port, workers)
+            os._exit(0)
+        try:
+            wait_until_listening(port)
+            load_args = Namespace(url=f"http://127.0.0.1:{port}", concurrency=args.concurrency, duration=args.duration,
+                                  warmup=args.warmup, mix=args.mix, forecasts=args.forecasts, password=password, seed=0)
+            results[f"workers_{workers}"] = run(load_args, sessions)
+        finally:
+            os.kill(server_pid, signal.SIGTERM)
+            os.waitpid(server_pid, 0)
+
+        total = results[f"workers_{workers}"]['total']
+        speedup = total['throughput_rps'] / results[f"workers_{args.workers[0]}"]['total']['throughput_rps']
+        print(f"{workers:>3} workers: {total['throughput_rps']:8.1f} req/s | p50 {total['p50_ms']:7.2f} ms | "
+              f"p99 {total['p99_ms']:8.2f} ms | {speedup:4.2f}x")
+
+    config = {key: value for key, value in vars(args).items()}
+    config['cpu_count'] = os.cpu_count()
+    save_results('scaling', config, results, path=args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+# Throughput of per-request update_one against the write-behind buffer under a burst of saves.
+# Run from backend/: python -m benchmarks.write_behind [--mongo-uri URI] [--latency-ms 2]
+# Without --mongo-uri an in-memory mongomock collection stands in for MongoDB; --latency-ms adds a
+# simulated network round trip to every call so the stand-in behaves more like a remote server.
+import argparse
+import threading
+import time
+from db.write_behind import WriteBehindBuffer
+
+appliances = ["TV", "AC", "Fridge", "Oven", "Fan", "Light"]
+
+# Adds a fixed delay to each round trip
+class SlowCollection:
+    def __init__(self, collection, latency):
+        self.collection = collection
+        self.latency = latency
+
+    def update_one(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.collection.update_one(*args, **kwargs)
+
+    def bulk_write(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return self.collection.bulk_write(*args, **kwargs)
+
+def make_collection(args):
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        collection = MongoClient(args.mongo_uri)["FAM_bench"]["Users"]
+        collection.drop()
+    else:
+        import mongomock
+        collection = mongomock.MongoClient()["FAM_bench"]["Users"]
+    collection.insert_many([{"email": f"user{i}@fam.io", **{a: 0 for a in appliances}, "total": 0} for i in range(args.users)])
+    return SlowCollection(collection, args.latency_ms / 1000) if args.latency_ms else collection
+
+# `threads` clients each save `updates` times, cycling over the user pool
+def run_burst(args, write):
+    def client(offset):
+        for i in range(args.updates):
+            email = f"user{(offset + i * args.threads) % args.users}@fam.io"
+            write(email, {**{a: (i >> k) & 1 for k, a in enumerate(appliances)}, "total": i})
+
+    workers = [threading.Thread(target=client, args=(t,)) for t in range(args.threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri')
+    parser.add_argument('--latency-ms', type=float, default=2.0)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--updates', type=int, default=500)
+    args = parser.parse_args()
+    total = args.threads * args.updates
+
+    collection = make_collection(args)
+    elapsed = run_burst(args, lambda email, fields: collection.update_one({"email": email}, {"$set": fields}))
+    print(f"update_one per request: {total / elapsed:10,.0f} updates/s ({total} updates in {elapsed:.2f} s)")
+
+    collection = make_collection(args)
+    buffer = WriteBehindBuffer(collection, flush_interval=0.05)
+    accepted = run_burst(args, buffer.submit)
+    start = time.perf_counter()
+    buffer.close()
+    drained = time.perf_counter() - start
+    print(f"write-behind buffer:    {total / accepted:10,.0f} updates/s accepted, "
+          f"{total / (accepted + drained):,.0f} updates/s durable ({accepted + drained:.2f} s incl. final flush)")
+    print(f"  {buffer.stats['flushed']} documents written in {buffer.stats['batches']} bulk writes, "
+          f"{buffer.stats['coalesced']} updates coalesced, {buffer.stats['rejected']} rejected")
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,67 @@ from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 import os
 from dotenv import load_dotenv
+from db.write_behind import WriteBehindBuffer
 
 load_dotenv()
 uri = os.getenv("MONGO_URI")
-client = MongoClient(uri, server_api=ServerApi('1'))
 
+# Connection pool sizing and timeouts (milliseconds), configurable per deployment
+def make_client():
+    return MongoClient(
+        uri,
+        server_api=ServerApi('1'),
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")),
+        connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+    )
+
+# Module attribute -> collection name. Callers read these through the module
+# (`connection.users_collection`) so reconnect() can swap them.
+collection_names = {
+    "users_collection": "Users",
+    "history_collection": "ApplianceHistory",  # hourly buckets of appliance-state changes
+    "precomputed_collection": "RegionForecasts",  # day-ahead predictions and ideal states per region
+    "precompute_runs_collection": "PrecomputeRuns"  # timing stats of the precompute jobs
+}
+
+client = make_client()
 db = client["FAM"]
 users_collection = db["Users"]
+history_collection = db["ApplianceHistory"]
+precomputed_collection = db["RegionForecasts"]
+precompute_runs_collection = db["PrecomputeRuns"]
+
+# Appliance-state writes go through a write-behind buffer that coalesces bursts per user
+state_writes = WriteBehindBuffer(
+    users_collection,
+    flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "0.5")),
+    max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500")),
+    max_pending=int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000")),
+    enqueue_timeout=float(os.getenv("WRITE_BEHIND_ENQUEUE_TIMEOUT", "1.0")),
+    max_events_per_user=int(os.getenv("WRITE_BEHIND_MAX_EVENTS_PER_USER", "1000")),
+    max_events=int(os.getenv("WRITE_BEHIND_MAX_EVENTS", "100000")),
+    history_collection=history_collection
+)
+
+# MongoClient is not fork-safe: a forked process (server worker, precompute shard) calls this first
+# to replace the inherited client with its own. The inherited one is dropped, not closed, since its
+# sockets belong to the parent. Collections already swapped for another client (e.g. mongomock in
+# the benchmarks) are left alone.
+def reconnect():
+    global client, db
+    old_client = client
+    client = make_client()
+    db = client["FAM"]
+    module = globals()
+    for attribute, name in collection_names.items():
+        if module[attribute].database.client is old_client:
+            module[attribute] = db[name]
+    if state_writes.collection.database.client is old_client:
+        state_writes.collection = users_collection
+    if state_writes.history_collection is not None and state_writes.history_collection.database.client is old_client:
+        state_writes.history_collection = history_collection
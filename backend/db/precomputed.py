@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
+from pymongo.errors import PyMongoError
+from db import connection
+from db.users import user_region
+from utils.ttl_cache import TTLCache
+
+# Rows change once an hour, so a short-lived cache absorbs repeated reads from the same region
+row_cache = TTLCache(maxsize=1024, ttl=60)
+
+# One row per (region, local date); the precompute job replaces it every run
+def ensure_precomputed_indexes():
+    connection.precomputed_collection.create_index([("region", ASCENDING), ("date", ASCENDING)], unique=True)
+    connection.precompute_runs_collection.create_index([("started_at", DESCENDING)])
+
+def store_region_rows(rows):
+    if rows:
+        connection.precomputed_collection.bulk_write(
+            [ReplaceOne({"region": row["region"], "date": row["date"]}, row, upsert=True) for row in rows],
+            ordered=False
+        )
+
+# Most recent row for a region (served by the routes; the caller checks it is for today)
+def latest_region_row(region):
+    return connection.precomputed_collection.find_one({"region": region}, {"_id": 0}, sort=[("date", DESCENDING)])
+
+# Today's row for a region (in the region's own timezone), or None when the precompute job has
+# not produced one yet
+def todays_row(region):
+    row = row_cache.get(region)
+    if row is None:
+        row = latest_region_row(region)
+        if row is None:
+            return None
+        row_cache.set(region, row)
+    if row["date"] != datetime.now(ZoneInfo(row["timezone"])).strftime("%Y-%m-%d"):
+        return None
+    return row
+
+# After a Mongo error the prediction routes skip the lookup below for this long, predicting live
+# instead of waiting out the server-selection timeout on every request
+LOOKUP_BACKOFF_SECONDS = 30
+_lookup_failed_at = None
+
+# Today's row for the region, or for the user's profile region when none is given. None when
+# there is no row or Mongo is unreachable, so the routes predict live.
+def request_row(region, email):
+    global _lookup_failed_at
+    if _lookup_failed_at is not None and time.monotonic() - _lookup_failed_at < LOOKUP_BACKOFF_SECONDS:
+        return None
+    try:
+        region = region or (user_region(email) if email else None)
+        return todays_row(region) if region else None
+    except PyMongoError as e:
+        _lookup_failed_at = time.monotonic()
+        print(f"⚠️ Precomputed row lookup failed, predicting live for {LOOKUP_BACKOFF_SECONDS}s: {e}")
+        return None
+
+# Number of users in each region (users without a region are not precomputed)
+def users_per_region():
+    pipeline = [
+        {"$match": {"region": {"$type": "string"}}},
+        {"$group": {"_id": "$region", "users": {"$sum": 1}}}
+    ]
+    return {group["_id"]: group["users"] for group in connection.users_collection.aggregate(pipeline)}
+
+def record_run(stats):
+    connection.precompute_runs_collection.insert_one(dict(stats))
+
+def recent_runs(limit=24):
+    return list(connection.precompute_runs_collection.find({}, {"_id": 0}).sort("started_at", DESCENDING).limit(limit))
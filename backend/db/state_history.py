@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+# Appliance order for the compact state bitmask (bit i is appliances[i])
+appliances = ["TV", "AC", "Fridge", "Oven", "Fan", "Light"]
+
+# Pack a list of 0/1 states (in `appliances` order) into an integer
+def states_to_mask(states):
+    return sum(1 << i for i, state in enumerate(states) if state == 1)
+
+def bucket_start(at):
+    return at.replace(minute=0, second=0, microsecond=0)
+
+# One state-change event, stamped now unless a time is given. The id makes re-sending the same
+# event (a retried flush) a no-op.
+def state_event(states, total, at=None):
+    return {"id": ObjectId(), "t": at or datetime.now(timezone.utc), "mask": states_to_mask(states), "total": total}
+
+# Compound index so a user's history for any date range is a single index range scan
+def ensure_history_indexes(history_collection):
+    history_collection.create_index([("email", ASCENDING), ("bucket_start", ASCENDING)], unique=True)
+
+# Upserts that append events to their per-user hourly buckets, one op per bucket. $addToSet
+# makes them idempotent: an event that is already in its bucket is not added again.
+def history_ops(events_by_email):
+    ops = []
+    for email, events in events_by_email.items():
+        buckets = {}
+        for event in events:
+            buckets.setdefault(bucket_start(event["t"]), []).append(event)
+        for start, bucket_events in buckets.items():
+            ops.append(UpdateOne(
+                {"email": email, "bucket_start": start},
+                {"$addToSet": {"events": {"$each": bucket_events}}},
+                upsert=True
+            ))
+    return ops
+
+def _utc(at):
+    return at if at.tzinfo else at.replace(tzinfo=timezone.utc)
+
+# A bucket's events in time order, with UTC-aware timestamps
+def _ordered_events(bucket):
+    return sorted(({**event, "t": _utc(event["t"])} for event in bucket["events"]), key=lambda event: event["t"])
+
+# Per-hour consumption for one user over every hour overlapping [start, end) (end is capped at now).
+# The reported total load (kW) holds until the next state change, so an hour's kWh is each load
+# weighted by how long it lasted within the hour. The state in force before `start` carries into
+# the range and hours without any change are filled from it; hours before the user's first
+# recorded state are left out.
+def hourly_consumption(history_collection, email, start, end):
+    end = min(end, datetime.now(timezone.utc))
+    first_hour = bucket_start(start)
+    projection = {"_id": 0, "events": 1}
+    previous = history_collection.find_one(
+        {"email": email, "bucket_start": {"$lt": first_hour}}, projection, sort=[("bucket_start", DESCENDING)]
+    )
+    buckets = history_collection.find({"email": email, "bucket_start": {"$gte": first_hour, "$lt": end}}, projection)
+    events = sorted((event for bucket in buckets for event in _ordered_events(bucket)), key=lambda event: event["t"])
+
+    state = _ordered_events(previous)[-1] if previous and previous["events"] else None
+    load = lambda event: float(event.get("total") or 0)
+    hours, i, hour = [], 0, first_hour
+    while hour < end:
+        if state is None:
+            # Nothing known yet: skip ahead to the hour of the first event
+            if i == len(events):
+                break
+            hour = max(hour, bucket_start(events[i]["t"]))
+        window_start, window_end = max(hour, start), min(hour + timedelta(hours=1), end)
+
+        # Events in the part of the first hour before `start` only set the starting state
+        while i < len(events) and events[i]["t"] < window_start:
+            state = events[i]
+            i += 1
+
+        kwh, changes, since = 0.0, 0, window_start
+        while i < len(events) and events[i]["t"] < window_end:
+            if state is not None:
+                kwh += load(state) * (events[i]["t"] - since).total_seconds() / 3600
+            state, since = events[i], events[i]["t"]
+            changes += 1
+            i += 1
+        if state is not None:
+            kwh += load(state) * (window_end - since).total_seconds() / 3600
+            hours.append({"hour": hour, "kwh": kwh, "changes": changes, "last_mask": state["mask"]})
+        hour += timedelta(hours=1)
+    return hours
+
+# Parse ISO-8601 query parameters (naive times are UTC), defaulting to the last `days` days
+def parse_range(start, end, days=1):
+    def parse(value):
+        parsed = datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    end = parse(end) if end else datetime.now(timezone.utc)
+    start = parse(start) if start else end - timedelta(days=days)
+    return start, end
@@ -0,0 +1,109 @@
+import os
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+from db import connection
+from db.connection import state_writes
+from db.state_history import ensure_history_indexes
+from utils.shared_cache import InvalidationLog
+from utils.ttl_cache import TTLCache
+from utils.metrics import stage
+
+# Fields returned to the client after login / profile reads
+profile_fields = ["email", "firstName", "lastName", "gender", "region"]
+appliance_fields = ["TV", "AC", "Fridge", "Oven", "Fan", "Light", "Total"]
+
+# Projections per call site, so Mongo only sends what each route uses
+exists_projection = {"_id": 1}
+login_projection = {"_id": 0, "password": 1, **{field: 1 for field in profile_fields + appliance_fields}}
+
+# Read cache for user records (login projection), invalidated whenever the user is written
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60"))
+)
+
+# Each server worker has its own user_cache, so with several workers every invalidation is also
+# published to a log in a SQLite file (set up by serve.py, or USER_CACHE_INVALIDATION_PATH) and
+# applied by the other workers before they read their cache
+invalidation_log = None
+
+def share_invalidations(path):
+    global invalidation_log
+    invalidation_log = InvalidationLog(path, retention=max(300.0, 2 * user_cache.ttl))
+
+if os.getenv("USER_CACHE_INVALIDATION_PATH"):
+    share_invalidations(os.getenv("USER_CACHE_INVALIDATION_PATH"))
+
+# Drop the cached record here and, through the log, in every other worker
+def invalidate_user(email):
+    user_cache.invalidate(email)
+    if invalidation_log is not None:
+        invalidation_log.publish(email)
+
+# Apply invalidations published by other workers since the last call
+def sync_invalidations():
+    if invalidation_log is not None:
+        for email in invalidation_log.poll():
+            user_cache.invalidate(email)
+
+def _invalidate_flushed(emails):
+    for email in emails:
+        invalidate_user(email)
+
+# Writes land in Mongo only when the buffer flushes, so drop cached copies again at that point
+state_writes.on_flush = _invalidate_flushed
+
+# Create the unique email index (and the history index) at startup; no-op when they exist
+def ensure_indexes():
+    connection.users_collection.create_index([("email", ASCENDING)], unique=True)
+    ensure_history_indexes(connection.history_collection)
+
+# Insert a new user; returns False if the email is already taken (enforced by the unique index)
+def create_user(document):
+    try:
+        with stage("mongo_insert_user"):
+            connection.users_collection.insert_one(document)
+    except DuplicateKeyError:
+        return False
+    invalidate_user(document["email"])
+    return True
+
+# Cheap existence check (cache first, then an _id-only projection)
+def user_exists(email):
+    sync_invalidations()
+    if user_cache.get(email) is not None:
+        return True
+    with stage("mongo_user_exists"):
+        return connection.users_collection.find_one({"email": email}, exists_projection) is not None
+
+# Cached user record with the password hash, profile and appliance states; None if not found
+def get_user_record(email):
+    sync_invalidations()
+    record = user_cache.get(email)
+    if record is None:
+        # A flush landing while we read invalidates the entry; the token keeps our older copy out
+        generation = user_cache.generation(email)
+        with stage("mongo_find_user"):
+            record = connection.users_collection.find_one({"email": email}, login_projection)
+        if record is not None:
+            # Another worker's flush published meanwhile also counts
+            sync_invalidations()
+            user_cache.set(email, record, generation=generation)
+    return record
+
+# Profile and appliance states without the password hash
+def get_profile(email):
+    record = get_user_record(email)
+    if record is None:
+        return None
+    return {field: record.get(field) for field in profile_fields + appliance_fields}
+
+# Queue an appliance-state update behind the write buffer; returns False when the buffer is full
+def save_appliance_states(email, fields, event=None):
+    invalidate_user(email)
+    return state_writes.submit(email, fields, event=event)
+
+# Weather region from the user's profile (None for users without one, or unknown users)
+def user_region(email):
+    record = get_user_record(email)
+    return record.get("region") if record is not None else None
@@ -0,0 +1,159 @@
+import atexit
+import os
+import threading
+import time
+from pymongo import UpdateOne
+from db.state_history import history_ops
+from utils.metrics import stage
+
+# Write-behind buffer for per-user $set updates: updates are coalesced per email (last write wins)
+# and flushed with bulk_write by a background worker. Optional history events are not coalesced;
+# every one is appended to its hourly bucket in `history_collection` on the same flush. Events are
+# capped per user and in total, with the same backpressure as the pending users.
+class WriteBehindBuffer:
+    def __init__(self, collection, flush_interval=0.5, max_batch=500, max_pending=10000, enqueue_timeout=1.0, history_collection=None, on_flush=None,
+                 max_events_per_user=1000, max_events=100000):
+        self.collection = collection
+        self.history_collection = history_collection
+        self.on_flush = on_flush  # called with the emails of every successfully written batch
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_events_per_user = max_events_per_user
+        self.max_events = max_events
+        self.enqueue_timeout = enqueue_timeout
+
+        self._pending = {}  # email -> fields to $set
+        self._events = {}  # email -> state-change events since the last flush
+        self._event_count = 0
+        self._cond = threading.Condition()
+        self._worker = None
+        self._worker_pid = None
+        self._closed = False
+        self.stats = {'submitted': 0, 'coalesced': 0, 'flushed': 0, 'batches': 0, 'rejected': 0, 'errors': 0}
+        atexit.register(self.close)
+
+    # Queue an update; returns False when the buffer stays full for enqueue_timeout (backpressure)
+    def submit(self, email, fields, event=None):
+        self._ensure_worker()
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._cond:
+            while self._is_full(email, event):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closed:
+                    self.stats['rejected'] += 1
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+
+            self.stats['submitted'] += 1
+            if email in self._pending:
+                self.stats['coalesced'] += 1
+                self._pending[email].update(fields)
+            else:
+                self._pending[email] = dict(fields)
+            if event is not None:
+                self._events.setdefault(email, []).append(event)
+                self._event_count += 1
+
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+        return True
+
+    # Whether accepting this update would exceed the pending-user or event caps
+    def _is_full(self, email, event):
+        if email not in self._pending and len(self._pending) >= self.max_pending:
+            return True
+        if event is None:
+            return False
+        return self._event_count >= self.max_events or len(self._events.get(email, ())) >= self.max_events_per_user
+
+    # Write everything queued so far, synchronously
+    def flush(self):
+        while self._flush_batch():
+            pass
+
+    # Stop the worker and durably flush what is left (also runs at interpreter exit)
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join()
+        self.flush()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    # Start the worker lazily, and again in a forked child (threads do not survive fork)
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._cond:
+            if self._worker_pid != os.getpid():
+                self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.max_batch and self._event_count < self.max_events:
+                    self._cond.wait(self.flush_interval)
+                if self._closed:
+                    return
+            self._flush_batch()
+
+    # Take up to max_batch coalesced updates and write them in one round trip; returns whether anything was written
+    def _flush_batch(self):
+        with self._cond:
+            if not self._pending:
+                return False
+            emails = list(self._pending)[:self.max_batch]
+            batch = {email: self._pending.pop(email) for email in emails}
+            events = {email: self._events.pop(email) for email in emails if email in self._events}
+            self._event_count -= sum(len(user_events) for user_events in events.values())
+            self._cond.notify_all()  # wake producers waiting for space
+
+        # Retries are safe: $set is idempotent and history events are added by id, so a retried
+        # event that already landed is not appended twice
+        written = False
+        # Users requeued only for their history have no fields left to $set
+        updates = [UpdateOne({"email": email}, {"$set": fields}) for email, fields in batch.items() if fields]
+        try:
+            if updates:
+                with stage("mongo_state_bulk_write"):
+                    self.collection.bulk_write(updates, ordered=False)
+            written = True
+            if events and self.history_collection is not None:
+                with stage("mongo_history_bulk_write"):
+                    self.history_collection.bulk_write(history_ops(events), ordered=False)
+            failed = None
+        except Exception as e:
+            failed = e
+
+        with self._cond:
+            if written:
+                self.stats['flushed'] += len(updates)
+                self.stats['batches'] += 1
+            if failed is not None:
+                self.stats['errors'] += 1
+                # Only what did not land is requeued; newer updates queued meanwhile win over failed ones
+                if not written:
+                    for email, fields in batch.items():
+                        self._pending[email] = {**fields, **self._pending.get(email, {})}
+                for email, failed_events in events.items():
+                    self._events[email] = failed_events + self._events.get(email, [])
+                    self._event_count += len(failed_events)
+                    # Events are flushed with their user's update, so keep the user in the queue
+                    self._pending.setdefault(email, {})
+
+        if written and self.on_flush is not None:
+            self.on_flush(list(batch))
+        if failed is not None:
+            what = f"{len(batch)} updates" if not written else f"history of {len(events)} users"
+            print(f"❌ Write-behind flush failed, requeueing {what}: {failed}")
+            time.sleep(self.flush_interval)
+            return False
+        return True
@@ -0,0 +1,146 @@
+import os
+import threading
+import joblib
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.multioutput import MultiOutputClassifier
+from ml.ingest import load_columns, source_hash, appliances_path
+
+# Bump when the training recipe changes so stale artifacts get retrained
+MODEL_VERSION = 2
+
+data_path = appliances_path
+model_path = 'models/appliance_tree.joblib'
+
+features = ['Day', 'Month', 'Hour', 'Temperature', 'Humidity', 'WindSpeed']
+appliances = ['Fridge', 'TV', 'AC', 'Oven', 'Fan', 'Light']
+
+_artifact = None
+_lock = threading.Lock()
+
+# Content hash of the training data, so the model is only retrained when the data changes
+def data_hash(path=data_path):
+    return source_hash(path)
+
+# Fit one depth-4 decision tree per appliance
+def train_appliance_model(path=data_path):
+    df = load_columns(path, features + appliances)
+    base_tree = DecisionTreeClassifier(max_depth=4, random_state=42)
+    multi_output_tree = MultiOutputClassifier(base_tree)
+    multi_output_tree.fit(df[features], df[appliances])
+    return multi_output_tree
+
+# Flattened decision trees: one row per tree in padded node tables, evaluated without sklearn or pandas
+class FlatTreeEnsemble:
+    def __init__(self, tables, names):
+        self.feature = tables['feature']
+        self.threshold = tables['threshold']
+        self.left = tables['left']
+        self.right = tables['right']
+        self.leaf_value = tables['leaf_value']
+        self.depth = int(tables['depth'])
+        self.names = list(names)
+        # Global node ids into the raveled tables, so the batch walk only does 1-D gathers
+        n_nodes = self.feature.shape[1]
+        self._offsets = np.arange(len(self.names)) * n_nodes
+        self._feature = self.feature.ravel().astype(np.intp)
+        self._threshold = self.threshold.ravel()
+        self._left = (self.left.astype(np.intp) + self._offsets[:, None]).ravel()
+        self._right = (self.right.astype(np.intp) + self._offsets[:, None]).ravel()
+        self._leaf_value = self.leaf_value.ravel()
+        # Plain-list copies make the single-row walk cheaper than any NumPy call
+        self._rows = list(zip(*(table.tolist() for table in (self.feature, self.threshold, self.left, self.right, self.leaf_value))))
+
+    # Export fitted estimators_ to node tables (feature, threshold, left, right, leaf value)
+    @staticmethod
+    def tables_from_model(multi_output_tree):
+        trees = [estimator.tree_ for estimator in multi_output_tree.estimators_]
+        n_nodes = max(tree.node_count for tree in trees)
+        shape = (len(trees), n_nodes)
+
+        tables = {
+            'feature': np.full(shape, -1, dtype=np.int8),
+            'threshold': np.zeros(shape, dtype=np.float64),
+            'left': np.zeros(shape, dtype=np.int16),
+            'right': np.zeros(shape, dtype=np.int16),
+            'leaf_value': np.zeros(shape, dtype=np.int8),
+            'depth': np.int8(max(tree.max_depth for tree in trees))
+        }
+        for i, (estimator, tree) in enumerate(zip(multi_output_tree.estimators_, trees)):
+            count = tree.node_count
+            is_leaf = tree.children_left == -1
+            tables['feature'][i, :count] = np.where(is_leaf, -1, tree.feature)
+            tables['threshold'][i, :count] = tree.threshold
+            # Leaves point to themselves so every tree can be walked for the same number of steps
+            tables['left'][i, :count] = np.where(is_leaf, np.arange(count), tree.children_left)
+            tables['right'][i, :count] = np.where(is_leaf, np.arange(count), tree.children_right)
+            tables['leaf_value'][i, :count] = estimator.classes_[tree.value[:, 0, :].argmax(axis=1)]
+        return tables
+
+    # Predict every appliance for one row given in feature order; returns {appliance: state}
+    def predict(self, row):
+        # sklearn compares float32 inputs against float64 thresholds
+        row = np.asarray(row, dtype=np.float32).tolist()
+        states = {}
+        for name, (feature, threshold, left, right, leaf_value) in zip(self.names, self._rows):
+            node = 0
+            while feature[node] >= 0:
+                node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+            states[name] = leaf_value[node]
+        return states
+
+    # Predict every appliance for a (rows x features) batch; returns a (rows x appliances) array
+    def predict_batch(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self._offsets, (len(X), len(self.names)))
+        for _ in range(self.depth):
+            values = X[rows, np.maximum(self._feature[node], 0)]
+            node = np.where(values <= self._threshold[node], self._left[node], self._right[node])
+        return self._leaf_value[node]
+
+# Train and persist the model together with the version and hash of the data it was fitted on
+def build_artifact(path=data_path, out_path=model_path):
+    artifact = {
+        'version': MODEL_VERSION,
+        'data_hash': data_hash(path),
+        'features': features,
+        'appliances': appliances,
+        'model': train_appliance_model(path)
+    }
+    artifact['flat'] = FlatTreeEnsemble.tables_from_model(artifact['model'])
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp_path = f"{out_path}.tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, out_path)
+    return artifact
+
+def _is_current(artifact, digest):
+    return (
+        artifact.get('version') == MODEL_VERSION
+        and artifact.get('data_hash') == digest
+        and artifact.get('features') == features
+        and artifact.get('appliances') == appliances
+    )
+
+# Load the persisted model on first use, retraining only if it is missing or was fitted on other data.
+# The artifact is cached per process, so workers forked after the first call share it copy-on-write.
+def get_appliance_model():
+    global _artifact
+    if _artifact is not None:
+        return _artifact
+
+    with _lock:
+        if _artifact is None:
+            digest = data_hash()
+            artifact = joblib.load(model_path) if os.path.exists(model_path) else None
+            if artifact is None or not _is_current(artifact, digest):
+                print("⚙️ Appliance model missing or stale, retraining...")
+                artifact = build_artifact()
+            artifact['evaluator'] = FlatTreeEnsemble(artifact['flat'], artifact['appliances'])
+            _artifact = artifact
+    return _artifact
+
+if __name__ == "__main__":
+    artifact = build_artifact()
+    print(f"✅ Appliance model trained and saved (data hash {artifact['data_hash'][:12]}).")
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+
+# Fold PolynomialFeatures(degree<=2) -> MinMaxScaler -> linear model into a single
+# quadratic form over the raw features: y = x^T A x + b^T x + c. When the model was trained on a
+# subset of the engineered features, `features` holds their column indices; it is stored with the
+# predictor, which then selects those columns from the full feature matrix itself.
+def compile_predictor(poly, scaler, model, features=None):
+    if getattr(scaler, 'clip', False):
+        raise ValueError("A clipping MinMaxScaler cannot be folded into a closed-form predictor")
+
+    powers = poly.powers_
+    if powers.sum(axis=1).max() > 2:
+        raise ValueError("Only polynomial expansions up to degree 2 can be compiled")
+
+    n_features = powers.shape[1]
+    # MinMaxScaler computes z * scale_ + min_, so its scale folds into the weights and its offset into c
+    weights = model.coef_ * scaler.scale_
+    A = np.zeros((n_features, n_features))
+    b = np.zeros(n_features)
+    c = float(model.intercept_ + model.coef_ @ scaler.min_)
+
+    for weight, power in zip(weights, powers):
+        nonzero = np.flatnonzero(power)
+        if power.sum() == 0:
+            c += weight
+        elif power.sum() == 1:
+            b[nonzero[0]] += weight
+        elif len(nonzero) == 1:
+            A[nonzero[0], nonzero[0]] += weight
+        else:
+            A[nonzero[0], nonzero[1]] += weight
+
+    compiled = {'A': A, 'b': b, 'c': np.float64(c)}
+    compiled.update(compile_std_terms(poly, scaler, model))
+    if features is not None:
+        compiled['features'] = np.asarray(features, dtype=np.int64)
+    return compiled
+
+# Precompute what predictive std needs: var = ||s L||^2 + 1/alpha_ with sigma_ = L L^T and
+# s = z * scale_ + min_ - X_offset_, so the scaler and centering fold into L and every batch
+# costs one matrix product
+def compile_std_terms(poly, scaler, model):
+    sigma = model.sigma_
+    try:
+        L = np.linalg.cholesky(sigma)
+    except np.linalg.LinAlgError:
+        # sigma_ can be numerically semi-definite; fall back to an eigen square root
+        eigvals, eigvecs = np.linalg.eigh(sigma)
+        L = eigvecs * np.sqrt(np.clip(eigvals, 0, None))
+
+    # Each polynomial column is the product of two raw columns, where index n_features stands for 1
+    n_features = poly.powers_.shape[1]
+    pairs = [np.repeat(np.arange(n_features), power).tolist() for power in poly.powers_]
+    pairs = np.array([(pair + [n_features, n_features])[:2] for pair in pairs])
+
+    return {
+        'poly_left': pairs[:, 0],
+        'poly_right': pairs[:, 1],
+        'std_factor': scaler.scale_[:, None] * L,
+        'std_offset': (scaler.min_ - getattr(model, 'X_offset_', 0)) @ L,
+        'noise_var': np.float64(1.0 / model.alpha_)
+    }
+
+# The columns of a full engineered feature matrix that the predictor was trained on
+def select_features(compiled, X):
+    X = np.asarray(X, dtype=np.float64)
+    return X[:, compiled['features']] if 'features' in compiled else X
+
+# Evaluate a compiled predictor over a (rows x features) matrix
+def predict_compiled(compiled, X):
+    X = select_features(compiled, X)
+    return ((X @ compiled['A']) * X).sum(axis=1) + X @ compiled['b'] + compiled['c']
+
+# Predictive standard deviation for a (rows x features) matrix, matching BayesianRidge.predict(return_std=True)
+def predict_std_compiled(compiled, X):
+    X = select_features(compiled, X)
+    X = np.hstack([X, np.ones((len(X), 1))])
+    Z = X[:, compiled['poly_left']] * X[:, compiled['poly_right']]
+    projected = Z @ compiled['std_factor'] + compiled['std_offset']
+    return np.sqrt((projected ** 2).sum(axis=1) + compiled['noise_var'])
+
+# Save a compiled predictor, replacing any previous file atomically
+def save_compiled_predictor(compiled, path):
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **compiled)
+    os.replace(tmp_path, path)
+
+def load_compiled_predictor(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
@@ -0,0 +1,164 @@
+import operator
+from functools import lru_cache
+from dataclasses import dataclass
+import numpy as np
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq
+}
+
+# A comparison of one input column against a constant, e.g. Condition('Temperature', '>', 28)
+@dataclass(frozen=True)
+class Condition:
+    column: str
+    op: str
+    value: float
+
+    def evaluate(self, columns):
+        return OPERATORS[self.op](np.asarray(columns[self.column]), self.value)
+
+# Turns `target` ON where every `all_of` condition holds and, if given, at least one `any_of` condition
+@dataclass(frozen=True)
+class ThresholdRule:
+    target: str
+    all_of: tuple = ()
+    any_of: tuple = ()
+
+    def evaluate(self, columns, n_rows):
+        on = np.ones(n_rows, dtype=bool)
+        for condition in self.all_of:
+            on &= condition.evaluate(columns)
+        if self.any_of:
+            on &= np.logical_or.reduce([condition.evaluate(columns) for condition in self.any_of])
+        return on
+
+# `keep` and `drop` cannot both be ON; `drop` is switched OFF when they clash
+@dataclass(frozen=True)
+class MutualExclusion:
+    keep: str
+    drop: str
+
+    def apply(self, states):
+        states[self.drop] &= ~states[self.keep]
+
+    def satisfied(self, states):
+        return ~(states[self.keep] & states[self.drop])
+
+# At most `max_on` appliances ON; excess ones are switched OFF in `shed_order` (least critical first)
+@dataclass(frozen=True)
+class CardinalityLimit:
+    max_on: int
+    shed_order: tuple
+
+    def apply(self, states):
+        count = sum(state.astype(np.int64) for state in states.values())
+        for appliance in self.shed_order:
+            shed = (count > self.max_on) & states[appliance]
+            states[appliance] &= ~shed
+            count -= shed
+
+    def satisfied(self, states):
+        return sum(state.astype(np.int64) for state in states.values()) <= self.max_on
+
+appliances = ['TV', 'AC', 'Fridge', 'Oven', 'Fan', 'Light']
+
+# Individual appliance rules
+FAM_RULES = (
+    ThresholdRule('TV', all_of=(Condition('Hour', '>=', 18), Condition('Hour', '<=', 23))),
+    ThresholdRule('AC', all_of=(Condition('Temperature', '>', 28),)),
+    ThresholdRule('Fridge'),  # Always ON
+    ThresholdRule('Oven', all_of=(Condition('Temperature', '<', 26), Condition('Hour', '>=', 10), Condition('Hour', '<=', 20))),
+    ThresholdRule('Fan', all_of=(Condition('Temperature', '>', 25), Condition('Humidity', '>', 60))),
+    ThresholdRule('Light', any_of=(Condition('Hour', '>=', 18), Condition('Hour', '<=', 6)))
+)
+
+# CSP constraints, applied in order after the rules
+FAM_CONSTRAINTS = (
+    MutualExclusion(keep='AC', drop='Oven'),  # Oven is used less critically than AC
+    CardinalityLimit(max_on=3, shed_order=('TV', 'Fan', 'Light', 'Oven', 'AC'))
+)
+
+def _n_rows(columns):
+    if hasattr(columns, 'columns'):  # DataFrame
+        return len(columns)
+    return len(next(iter(columns.values())))
+
+# Evaluate the rules column-wise over a whole frame (or any mapping of column -> array)
+def rule_states(columns, rules=FAM_RULES):
+    n_rows = _n_rows(columns)
+    return {rule.target: rule.evaluate(columns, n_rows) for rule in rules}
+
+# Rule states with every constraint enforced, as int8 arrays keyed by appliance
+def label_states(columns, rules=FAM_RULES, constraints=FAM_CONSTRAINTS):
+    states = rule_states(columns, rules)
+    for constraint in constraints:
+        constraint.apply(states)
+    return {appliance: state.astype(np.int8) for appliance, state in states.items()}
+
+# --- Online fault correction ---
+
+# Every distinct condition the rules depend on; their outcomes are the discretized input bucket
+def rule_conditions(rules=FAM_RULES):
+    conditions = []
+    for rule in rules:
+        for condition in rule.all_of + rule.any_of:
+            if condition not in conditions:
+                conditions.append(condition)
+    return tuple(conditions)
+
+FAM_CONDITIONS = rule_conditions()
+
+# Bitmask over `appliances` (bit i is appliances[i]); missing appliances count as OFF
+def states_to_mask(states):
+    return sum(1 << i for i, appliance in enumerate(appliances) if states.get(appliance, 0) == 1)
+
+def mask_to_states(mask):
+    return {appliance: (mask >> i) & 1 for i, appliance in enumerate(appliances)}
+
+# Discretize raw conditions into the tuple of rule-condition outcomes
+def condition_bucket(values, conditions=FAM_CONDITIONS):
+    return tuple(bool(condition.evaluate(values)) for condition in conditions)
+
+# All 2^n appliance combinations, as boolean columns keyed by appliance
+_candidate_masks = np.arange(1 << len(appliances))
+_candidate_states = {appliance: ((_candidate_masks >> i) & 1).astype(bool) for i, appliance in enumerate(appliances)}
+
+# Appliances with an unconditional rule (Fridge) are hard requirements
+_required = [rule.target for rule in FAM_RULES if not rule.all_of and not rule.any_of]
+
+_feasible = np.ones(len(_candidate_masks), dtype=bool)
+for _constraint in FAM_CONSTRAINTS:
+    _feasible &= _constraint.satisfied(_candidate_states)
+for _appliance in _required:
+    _feasible &= _candidate_states[_appliance]
+
+def _popcount(masks):
+    masks = np.asarray(masks)
+    return sum((masks >> i) & 1 for i in range(len(appliances)))
+
+# Nearest feasible state set: fewest toggles from the current states, ties broken toward the
+# rule-labelled states for this bucket. Only bucket outcomes and the current mask matter, so
+# results are memoized and repeated calls are O(1).
+@lru_cache(maxsize=4096)
+def nearest_feasible_mask(bucket, current_mask):
+    outcome = dict(zip(FAM_CONDITIONS, bucket))
+    ideal = {}
+    for rule in FAM_RULES:
+        on = all(outcome[c] for c in rule.all_of) and (not rule.any_of or any(outcome[c] for c in rule.any_of))
+        ideal[rule.target] = np.array([on])
+    for constraint in FAM_CONSTRAINTS:
+        constraint.apply(ideal)
+    ideal_mask = states_to_mask({appliance: int(state[0]) for appliance, state in ideal.items()})
+
+    cost = _popcount(_candidate_masks ^ current_mask) * (len(appliances) + 1) + _popcount(_candidate_masks ^ ideal_mask)
+    cost = np.where(_feasible, cost, np.iinfo(cost.dtype).max)
+    return int(_candidate_masks[np.argmin(cost)])
+
+# Correct a home's current states given its conditions (Temperature, Humidity, Hour)
+def correct_states(conditions, current_states):
+    bucket = condition_bucket(conditions)
+    return mask_to_states(nearest_feasible_mask(bucket, states_to_mask(current_states)))
@@ -0,0 +1,65 @@
+import numpy as np
+
+# Order of the engineered inputs the Bayesian model was trained on
+FEATURE_NAMES = ['Temperature', 'Humidity', 'WindSpeed', 'Hour', 'Hour_sin', 'Hour_cos', 'Month', 'Day', 'Is_Weekday', 'Is_Evening', 'Temp_Hour_Interaction', 'Temp_Evening_Interaction']
+
+# Named subsets of the engineered inputs, searched by model_train.py --search and accepted by --features
+FEATURE_SETS = {
+    'all': FEATURE_NAMES,
+    'no-interactions': [name for name in FEATURE_NAMES if not name.endswith('_Interaction')],
+    'no-cyclic': [name for name in FEATURE_NAMES if name not in ('Hour_sin', 'Hour_cos')],
+    'no-date': [name for name in FEATURE_NAMES if name not in ('Month', 'Day')],
+    'weather+hour': ['Temperature', 'Humidity', 'WindSpeed', 'Hour', 'Hour_sin', 'Hour_cos'],
+    'weather': ['Temperature', 'Humidity', 'WindSpeed']
+}
+
+# Column indices (in FEATURE_NAMES order) of a named subset or of comma-separated feature names
+def feature_indices(spec):
+    names = FEATURE_SETS[spec] if spec in FEATURE_SETS else spec.split(',')
+    unknown = set(names) - set(FEATURE_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
+    return np.array([i for i, name in enumerate(FEATURE_NAMES) if name in names], dtype=np.int64)
+
+# Split datetime64 timestamps into hour, month, day and weekday (Monday = 0) arrays
+def calendar_columns(timestamps):
+    ts = np.asarray(timestamps, dtype='datetime64[h]')
+    days = ts.astype('datetime64[D]')
+    months = ts.astype('datetime64[M]')
+
+    hour = (ts - days).astype(np.int64)
+    day = (days - months).astype(np.int64) + 1
+    month = months.astype(np.int64) % 12 + 1
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    return hour, month, day, weekday
+
+# Hourly timestamps for several forecasts stacked end to end, each one starting at `start`
+def forecast_timestamps(start, lengths):
+    lengths = np.asarray(lengths, dtype=np.int64)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    offsets = np.arange(lengths.sum()) - starts
+    return np.datetime64(start, 'h') + offsets
+
+# Build the (rows x 12) feature matrix for aligned weather arrays and timestamps
+def build_features(temperatures, humidities, winds, timestamps):
+    temperatures = np.asarray(temperatures, dtype=np.float64)
+    hour, month, day, weekday = calendar_columns(timestamps)
+
+    is_weekday = (weekday < 5).astype(np.int64)
+    is_evening = ((hour >= 17) & (hour <= 21)).astype(np.int64)
+    angle = 2 * np.pi * hour / 24
+
+    return np.column_stack([
+        temperatures,
+        np.asarray(humidities, dtype=np.float64),
+        np.asarray(winds, dtype=np.float64),
+        hour,
+        np.sin(angle),
+        np.cos(angle),
+        month,
+        day,
+        is_weekday,
+        is_evening,
+        temperatures * hour,
+        temperatures * is_evening
+    ])
@@ -0,0 +1,157 @@
+import os
+import pickle
+import numpy as np
+from sklearn.linear_model import BayesianRidge
+from sklearn.preprocessing import MinMaxScaler
+from ml.bayesian import compile_predictor, save_compiled_predictor
+
+# Sufficient statistics over the polynomial feature space. Co-moments are kept about the running
+# means (Chan et al. pairwise update) rather than as raw X^T X, which would lose precision to
+# cancellation once the large interaction terms are squared and summed over years of data.
+def empty_stats(n_features):
+    return {
+        'n': np.int64(0),
+        'z_mean': np.zeros(n_features),
+        'z_comoment': np.zeros((n_features, n_features)),
+        'z_min': np.full(n_features, np.inf),
+        'z_max': np.full(n_features, -np.inf),
+        'y_mean': np.float64(0),
+        'zy_comoment': np.zeros(n_features),
+        'y_comoment': np.float64(0),
+        'version': np.int64(0)
+    }
+
+# Fold a chunk of polynomial features Z and targets y into the statistics; cost is O(rows * d^2)
+def update_stats(stats, Z, y):
+    Z = np.asarray(Z, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n_b = len(Z)
+    if n_b == 0:
+        return stats
+
+    z_mean_b = Z.mean(axis=0)
+    y_mean_b = y.mean()
+    Zc = Z - z_mean_b
+    yc = y - y_mean_b
+
+    n_a = stats['n']
+    n = n_a + n_b
+    dz = z_mean_b - stats['z_mean']
+    dy = y_mean_b - stats['y_mean']
+    weight = n_a * n_b / n
+
+    return {
+        **stats,
+        'n': np.int64(n),
+        'z_mean': stats['z_mean'] + dz * n_b / n,
+        'z_comoment': stats['z_comoment'] + Zc.T @ Zc + np.outer(dz, dz) * weight,
+        'z_min': np.minimum(stats['z_min'], Z.min(axis=0)),
+        'z_max': np.maximum(stats['z_max'], Z.max(axis=0)),
+        'y_mean': stats['y_mean'] + dy * n_b / n,
+        'zy_comoment': stats['zy_comoment'] + Zc.T @ yc + dz * dy * weight,
+        'y_comoment': stats['y_comoment'] + yc @ yc + dy * dy * weight
+    }
+
+def load_stats(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+# Rebuild a MinMaxScaler (default (0, 1) range) from the tracked per-feature min/max
+def scaler_from_stats(stats):
+    data_range = stats['z_max'] - stats['z_min']
+    scaler = MinMaxScaler()
+    scaler.data_min_ = stats['z_min']
+    scaler.data_max_ = stats['z_max']
+    scaler.data_range_ = data_range
+    scaler.scale_ = 1.0 / np.where(data_range == 0, 1.0, data_range)
+    scaler.min_ = -stats['z_min'] * scaler.scale_
+    scaler.n_samples_seen_ = int(stats['n'])
+    scaler.n_features_in_ = len(data_range)
+    return scaler
+
+# Re-run BayesianRidge's evidence iterations (MacKay updates of alpha_/lambda_) from the statistics
+# alone, following sklearn's fit step for step; cost is O(d^3) regardless of how many rows were seen
+def solve_bayesian_ridge(stats, scaler, alpha_1=1e-6, alpha_2=1e-6, lambda_1=1e-6, lambda_2=1e-6, max_iter=300, tol=1e-3):
+    n = float(stats['n'])
+    scale = scaler.scale_
+
+    # Centered statistics of the scaled features (centering removes the scaler's offset)
+    XT_X = stats['z_comoment'] * np.outer(scale, scale)
+    XT_y = stats['zy_comoment'] * scale
+    X_offset = stats['z_mean'] * scale + scaler.min_
+    y_offset = float(stats['y_mean'])
+
+    eigen_vals_, V = np.linalg.eigh(XT_X)
+    eigen_vals_ = np.clip(eigen_vals_, 0, None)
+
+    def update_coef(alpha_, lambda_):
+        coef_ = V @ ((V.T @ XT_y) / (eigen_vals_ + lambda_ / alpha_))
+        sse_ = stats['y_comoment'] - 2 * coef_ @ XT_y + coef_ @ XT_X @ coef_
+        return coef_, max(sse_, 0.0)
+
+    eps = np.finfo(np.float64).eps
+    alpha_ = 1.0 / (stats['y_comoment'] / n + eps)
+    lambda_ = 1.0
+    coef_old_ = None
+    for iter_ in range(max_iter):
+        coef_, sse_ = update_coef(alpha_, lambda_)
+
+        gamma_ = np.sum((alpha_ * eigen_vals_) / (lambda_ + alpha_ * eigen_vals_))
+        lambda_ = (gamma_ + 2 * lambda_1) / (np.sum(coef_ ** 2) + 2 * lambda_2)
+        alpha_ = (n - gamma_ + 2 * alpha_1) / (sse_ + 2 * alpha_2)
+
+        if iter_ != 0 and np.sum(np.abs(coef_old_ - coef_)) < tol:
+            break
+        coef_old_ = np.copy(coef_)
+
+    model = BayesianRidge(alpha_1=alpha_1, alpha_2=alpha_2, lambda_1=lambda_1, lambda_2=lambda_2, max_iter=max_iter, tol=tol)
+    model.n_iter_ = iter_ + 1
+    model.alpha_ = alpha_
+    model.lambda_ = lambda_
+    model.coef_, _ = update_coef(alpha_, lambda_)
+    model.sigma_ = V @ (V.T / (alpha_ * eigen_vals_ + lambda_)[:, np.newaxis])
+    model.X_offset_ = X_offset
+    model.X_scale_ = np.ones_like(X_offset)
+    model.intercept_ = y_offset - X_offset @ model.coef_
+    model.n_features_in_ = len(X_offset)
+    model.scores_ = []
+    return model
+
+# Write a set of files so that each one appears atomically: everything is staged first, then renamed
+def _replace_all(writers):
+    staged = []
+    for path, write in writers:
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        staged.append((tmp_path, path))
+    for tmp_path, path in staged:
+        os.replace(tmp_path, path)
+
+# Publish a new model version: pickles, statistics and the served compiled predictor. The compiled
+# predictor is renamed last, so the API never serves a version whose files are not all in place.
+# The feature subset recorded in the statistics (if any) is compiled into the predictor.
+def publish_model(save_dir, poly, scaler, model, stats):
+    stats = {**stats, 'version': np.int64(stats['version'] + 1)}
+    compiled = compile_predictor(poly, scaler, model, features=stats.get('features'))
+    compiled['version'] = stats['version']
+
+    def pickle_writer(obj):
+        def write(path):
+            with open(path, 'wb') as f:
+                pickle.dump(obj, f)
+        return write
+
+    def npz_writer(arrays):
+        def write(path):
+            with open(path, 'wb') as f:
+                np.savez(f, **arrays)
+        return write
+
+    _replace_all([
+        (os.path.join(save_dir, 'bayesian_model.pkl'), pickle_writer(model)),
+        (os.path.join(save_dir, 'scaler.pkl'), pickle_writer(scaler)),
+        (os.path.join(save_dir, 'poly.pkl'), pickle_writer(poly)),
+        (os.path.join(save_dir, 'bayesian_stats.npz'), npz_writer(stats)),
+    ])
+    save_compiled_predictor(compiled, os.path.join(save_dir, 'bayesian_compiled.npz'))
+    return stats
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from ml.features import build_features
+
+aggregated_path = 'static/powerconsumption_aggregated.csv'
+appliances_path = 'static/powerconsumption_with_appliances.csv'
+
+# Columnar .npy cache of the CSVs, one directory per dataset
+cache_dir = 'static/cache'
+
+# Rows per chunk; memory use is bounded by this, not by the length of the history
+CHUNK_ROWS = 100_000
+
+# Compact dtypes: float32 weather/consumption, int8 hour and appliance flags
+DTYPES = {
+    'Temperature': np.float32,
+    'Humidity': np.float32,
+    'WindSpeed': np.float32,
+    'Consumption': np.float32,
+    'Hour': np.int8,
+    'Fridge': np.int8,
+    'TV': np.int8,
+    'AC': np.int8,
+    'Oven': np.int8,
+    'Fan': np.int8,
+    'Light': np.int8
+}
+
+# Add the calendar columns derived from Datetime, vectorized over the chunk
+def add_calendar_columns(chunk):
+    timestamps = chunk['Datetime']
+    chunk['Hour'] = timestamps.dt.hour.astype(np.int8)
+    chunk['Month'] = timestamps.dt.month.astype(np.int8)
+    chunk['Day'] = timestamps.dt.day.astype(np.int8)
+    chunk['Is_Weekday'] = (timestamps.dt.weekday < 5).astype(np.int8)
+    chunk['Is_Evening'] = chunk['Hour'].between(17, 21).astype(np.int8)
+    return chunk
+
+# Stream a power-consumption CSV as DataFrame chunks with compact dtypes and calendar columns
+def iter_chunks(path, chunk_rows=CHUNK_ROWS, usecols=None, dtypes=DTYPES):
+    reader = pd.read_csv(path, chunksize=chunk_rows, dtype=dtypes, usecols=usecols)
+    for chunk in reader:
+        chunk['Datetime'] = parse_datetimes(chunk['Datetime'])
+        yield add_calendar_columns(chunk)
+
+# The shipped datasets use one fixed format, which parses much faster than inference; other files
+# (e.g. incremental telemetry) may use any format pandas can infer
+def parse_datetimes(values):
+    try:
+        return pd.to_datetime(values, format='%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return pd.to_datetime(values)
+
+# --- Columnar binary cache ---
+
+# Only the datasets shipped with the app are cached; one-off files (e.g. incremental telemetry)
+# are streamed straight from the CSV so they don't leave a copy behind
+cached_datasets = (aggregated_path, appliances_path)
+
+def is_cached_dataset(path):
+    return os.path.realpath(path) in {os.path.realpath(dataset) for dataset in cached_datasets}
+
+# One directory per source file, keyed by its resolved path so files sharing a name don't collide
+def _cache_location(path):
+    resolved = os.path.realpath(path)
+    name = os.path.splitext(os.path.basename(resolved))[0]
+    return os.path.join(cache_dir, f"{name}-{hashlib.sha1(resolved.encode()).hexdigest()[:12]}")
+
+# Size and mtime identify the CSV version a cache was built from without re-reading the file
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _read_manifest(location):
+    try:
+        with open(os.path.join(location, 'manifest.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+# SHA-256 of the CSV and an upper bound on its data rows (lines minus the header), in one pass
+def _scan_source(path):
+    digest = hashlib.sha256()
+    newlines, last = 0, b''
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+            newlines += block.count(b'\n')
+            last = block[-1:]
+    lines = newlines + (1 if last and last != b'\n' else 0)
+    return digest.hexdigest(), max(lines - 1, 0)
+
+# Copy the first `rows` rows of a .npy file into a new, exactly sized one, a chunk at a time
+def _truncate_npy(path, rows):
+    source = np.load(path, mmap_mode='r')
+    tmp_path = f"{path}.trim.npy"
+    target = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=source.dtype, shape=(rows,))
+    for start in range(0, rows, CHUNK_ROWS):
+        target[start:start + CHUNK_ROWS] = source[start:min(start + CHUNK_ROWS, rows)]
+    target.flush()
+    del source, target
+    os.replace(tmp_path, path)
+
+# Parse the CSV once (in chunks) and write every column, derived calendar columns included, as a
+# .npy array. Each chunk goes straight into a preallocated memory-mapped file, so memory use stays
+# bounded by the chunk size. The manifest is written last, so a half-built cache is never
+# considered fresh.
+def build_column_cache(path):
+    location = _cache_location(path)
+    os.makedirs(location, exist_ok=True)
+
+    signature = _source_signature(path)
+    sha256, capacity = _scan_source(path)
+
+    # Temporary files are per process, so concurrent builders never write into each other's files
+    suffix = f".tmp.{os.getpid()}.npy"
+    arrays = {}
+    rows = 0
+    for chunk in iter_chunks(path):
+        end = rows + len(chunk)
+        for column in chunk.columns:
+            values = chunk[column].to_numpy(dtype='datetime64[s]') if column == 'Datetime' else chunk[column].to_numpy()
+            if column not in arrays:
+                arrays[column] = np.lib.format.open_memmap(os.path.join(location, column + suffix), mode='w+',
+                                                           dtype=values.dtype, shape=(capacity,))
+            arrays[column][rows:end] = values
+        rows = end
+
+    columns = {}
+    for column in list(arrays):
+        array = arrays.pop(column)
+        columns[column] = str(array.dtype)
+        array.flush()
+        tmp_path = array.filename
+        del array
+        # Blank lines make the line count an overestimate; trim to the parsed rows
+        if rows < capacity:
+            _truncate_npy(tmp_path, rows)
+        os.replace(tmp_path, os.path.join(location, f"{column}.npy"))
+
+    manifest = {**signature, 'sha256': sha256, 'rows': rows, 'columns': columns}
+    tmp_path = os.path.join(location, f"manifest.json.tmp.{os.getpid()}")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(location, 'manifest.json'))
+    return manifest
+
+# Manifest of an up-to-date cache for `path`, rebuilding it from the CSV if it is missing or stale
+def ensure_column_cache(path):
+    manifest = _read_manifest(_cache_location(path))
+    signature = _source_signature(path)
+    if manifest is None or any(manifest.get(key) != value for key, value in signature.items()):
+        manifest = build_column_cache(path)
+    return manifest
+
+# SHA-256 of the CSV contents, taken from the cache manifest when the cache is fresh
+def source_hash(path):
+    return ensure_column_cache(path)['sha256']
+
+# Memory-mapped, zero-copy column arrays for a dataset; only parses the CSV when the cache is stale
+def open_columns(path, columns=None):
+    manifest = ensure_column_cache(path)
+    location = _cache_location(path)
+    columns = columns or list(manifest['columns'])
+    return {column: np.load(os.path.join(location, f"{column}.npy"), mmap_mode='r') for column in columns}
+
+# Stream (X, y) batches for the energy model: sliced from the memory-mapped columns for the
+# cached datasets, parsed chunk by chunk for any other CSV
+def iter_feature_batches(path=aggregated_path, chunk_rows=CHUNK_ROWS):
+    if not is_cached_dataset(path):
+        for chunk in iter_chunks(path, chunk_rows, usecols=['Datetime', 'Temperature', 'Humidity', 'WindSpeed', 'Consumption']):
+            X = build_features(
+                chunk['Temperature'].to_numpy(),
+                chunk['Humidity'].to_numpy(),
+                chunk['WindSpeed'].to_numpy(),
+                chunk['Datetime'].to_numpy(dtype='datetime64[s]')
+            )
+            yield X, chunk['Consumption'].to_numpy()
+        return
+
+    columns = open_columns(path, ['Datetime', 'Temperature', 'Humidity', 'WindSpeed', 'Consumption'])
+    for start in range(0, len(columns['Datetime']), chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        X = build_features(
+            columns['Temperature'][rows],
+            columns['Humidity'][rows],
+            columns['WindSpeed'][rows],
+            columns['Datetime'][rows]
+        )
+        yield X, np.asarray(columns['Consumption'][rows])
+
+# Selected columns as a DataFrame, for consumers that need the whole history in memory
+def load_columns(path, columns):
+    return pd.DataFrame({column: np.asarray(values) for column, values in open_columns(path, columns).items()})
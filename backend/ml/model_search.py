@@ -0,0 +1,215 @@
+import itertools
+import multiprocessing
+import os
+import time
+import timeit
+from multiprocessing import shared_memory
+import numpy as np
+from sklearn.linear_model import BayesianRidge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.preprocessing import MinMaxScaler, PolynomialFeatures
+from ml.bayesian import compile_predictor, predict_compiled, predict_std_compiled
+from ml.features import FEATURE_NAMES, FEATURE_SETS, build_features
+from ml.ingest import aggregated_path, open_columns
+
+# Hyperparameter and feature-set search for the Bayesian energy model. All engineered features are
+# expanded once to the highest polynomial degree searched; every lower degree and every feature
+# subset is a column mask over that matrix. The matrix lives in shared memory, so the worker
+# processes read it without a copy, and each task fits one (degree, features, priors, time fold)
+# combination.
+
+DEGREES = (1, 2, 3)
+
+# Gamma priors on the noise (alpha) and weight (lambda) precisions; 1e-6 everywhere is the
+# production setting
+PRIORS = [
+    {'alpha_1': alpha_1, 'alpha_2': 1e-6, 'lambda_1': lambda_1, 'lambda_2': lambda_2}
+    for alpha_1, lambda_1, lambda_2 in itertools.product((1e-6, 1e-2, 1.0), (1e-6, 1e-2, 1.0), (1e-6, 1.0))
+]
+
+# Rows per inference-cost measurement (an API request predicts 24-hour forecasts, batches are larger)
+COST_ROWS = 1024
+
+# The engineered feature matrix of the whole history in time order, with its targets
+def load_history(path=aggregated_path):
+    columns = open_columns(path, ['Datetime', 'Temperature', 'Humidity', 'WindSpeed', 'Consumption'])
+    order = np.argsort(np.asarray(columns['Datetime']), kind='stable')
+    X_raw = build_features(
+        np.asarray(columns['Temperature'])[order],
+        np.asarray(columns['Humidity'])[order],
+        np.asarray(columns['WindSpeed'])[order],
+        np.asarray(columns['Datetime'])[order]
+    )
+    return X_raw, np.asarray(columns['Consumption'], dtype=np.float64)[order]
+
+# Copy an array into a new shared memory block; returns the block and what a worker needs to attach
+def share_array(array):
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+# Worker-side view of the shared arrays; read-only so no task can disturb another
+_shared = {}
+
+def _attach(specs):
+    for key, (name, shape, dtype) in specs.items():
+        # Pool workers share the parent's resource tracker, so the parent's unlink covers this attach too
+        block = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        view.flags.writeable = False
+        _shared[key] = (block, view)
+
+# Columns of the max-degree expansion that make up the expansion of a lower degree over a subset
+# of the engineered features (the terms whose powers only involve those features)
+def expansion_columns(poly, degree, features):
+    excluded = np.setdiff1d(np.arange(poly.powers_.shape[1]), features)
+    powers = poly.powers_
+    return np.flatnonzero((powers.sum(axis=1) <= degree) & (powers[:, excluded].sum(axis=1) == 0))
+
+# Column indices of a list of feature names
+def name_indices(names):
+    return np.array([FEATURE_NAMES.index(name) for name in names], dtype=np.int64)
+
+# Fit and score one (degree, features, priors, fold) task against the shared matrices
+def evaluate_task(task):
+    columns, priors, train, test = task['columns'], task['priors'], task['train'], task['test']
+    X, y = _shared['X'][1], _shared['y'][1]
+
+    started = time.perf_counter()
+    scaler = MinMaxScaler()
+    X_train = scaler.fit_transform(X[train[0]:train[1], columns])
+    model = BayesianRidge(**priors)
+    model.fit(X_train, y[train[0]:train[1]])
+    fit_seconds = time.perf_counter() - started
+
+    y_test = y[test[0]:test[1]]
+    y_pred = model.predict(scaler.transform(X[test[0]:test[1], columns]))
+    return {
+        'key': task['key'],
+        'fold': task['fold'],
+        'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'fit_seconds': fit_seconds
+    }
+
+# Nanoseconds per row for mean + std predictions on the path the API would serve: the compiled
+# quadratic form for degree <= 2, the sklearn pipeline otherwise, both starting from the full
+# engineered feature matrix. Measured in the parent after the parallel phase so the timings are
+# not skewed by contention.
+def inference_cost(degree, features, X_raw, y, priors):
+    poly = PolynomialFeatures(degree=degree, include_bias=False)
+    scaler = MinMaxScaler()
+    model = BayesianRidge(**priors).fit(scaler.fit_transform(poly.fit_transform(X_raw[:, features])), y)
+    rows = X_raw[-COST_ROWS:]
+
+    if degree <= 2:
+        compiled = compile_predictor(poly, scaler, model, features=features)
+        path = 'compiled'
+        run = lambda: (predict_compiled(compiled, rows), predict_std_compiled(compiled, rows))
+    else:
+        path = 'sklearn'
+        run = lambda: model.predict(scaler.transform(poly.transform(rows[:, features])), return_std=True)
+
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return {'path': path, 'ns_per_row': best / len(rows) * 1e9, 'n_features': int(poly.n_output_features_)}
+
+def config_key(degree, feature_set, priors):
+    return f"degree={degree} features={feature_set} " + " ".join(f"{name}={value:g}" for name, value in priors.items())
+
+# Inverse of config_key: (degree, feature set name, priors) of a leaderboard configuration
+def parse_config_key(key):
+    try:
+        fields = dict(field.split('=', 1) for field in key.split())
+        return int(fields.pop('degree')), fields.pop('features'), {name: float(value) for name, value in fields.items()}
+    except (KeyError, ValueError):
+        raise ValueError(f"Not a leaderboard configuration: {key!r}") from None
+
+# Run the search and return one summary per (degree, feature set, priors), best mean RMSE first.
+# feature_sets maps a name (passed to model_train.py --features to train on it) to feature names.
+def run_search(degrees=DEGREES, priors=PRIORS, feature_sets=FEATURE_SETS, folds=5, processes=None):
+    X_raw, y = load_history()
+    poly = PolynomialFeatures(degree=max(degrees), include_bias=False)
+    X = poly.fit_transform(X_raw)
+    print(f"⚙️ {len(X)} rows, {X.shape[1]} features at degree {max(degrees)} ({X.nbytes / 2**20:.1f} MiB shared)")
+
+    # Expanding-window folds in time order: always train on the past, test on the block after it
+    splits = [(train[[0, -1]] + [0, 1], test[[0, -1]] + [0, 1]) for train, test in TimeSeriesSplit(n_splits=folds).split(X)]
+    configs = {
+        config_key(degree, feature_set, prior): (degree, feature_set, prior)
+        for degree in degrees for feature_set in feature_sets for prior in priors
+    }
+    columns = {
+        (degree, feature_set): expansion_columns(poly, degree, name_indices(names))
+        for degree in degrees for feature_set, names in feature_sets.items()
+    }
+    tasks = [
+        {'key': key, 'fold': fold, 'columns': columns[degree, feature_set], 'priors': prior,
+         'train': tuple(int(i) for i in train), 'test': tuple(int(i) for i in test)}
+        for key, (degree, feature_set, prior) in configs.items()
+        for fold, (train, test) in enumerate(splits)
+    ]
+
+    blocks, specs = [], {}
+    try:
+        for name, array in (('X', X), ('y', y)):
+            block, specs[name] = share_array(array)
+            blocks.append(block)
+        processes = processes or os.cpu_count() or 1
+        print(f"🚀 {len(tasks)} fits ({len(configs)} configurations x {folds} folds) on {processes} processes")
+        started = time.perf_counter()
+        with multiprocessing.Pool(processes, initializer=_attach, initargs=(specs,)) as pool:
+            scores = pool.map(evaluate_task, tasks, chunksize=max(1, len(tasks) // (processes * 4)))
+        search_seconds = time.perf_counter() - started
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    costs = {
+        (degree, feature_set): inference_cost(degree, name_indices(names), X_raw, y, PRIORS[0])
+        for degree in degrees for feature_set, names in feature_sets.items()
+    }
+
+    leaderboard = []
+    for key, (degree, feature_set, prior) in configs.items():
+        folds_scores = [score for score in scores if score['key'] == key]
+        rmse = np.array([score['rmse'] for score in folds_scores])
+        leaderboard.append({
+            'config': key,
+            'degree': degree,
+            'features': feature_set,
+            'feature_names': list(feature_sets[feature_set]),
+            'priors': prior,
+            'rmse': float(rmse.mean()),
+            'rmse_std': float(rmse.std()),
+            'mae': float(np.mean([score['mae'] for score in folds_scores])),
+            'r2': float(np.mean([score['r2'] for score in folds_scores])),
+            'fit_ms': float(np.mean([score['fit_seconds'] for score in folds_scores]) * 1000),
+            **costs[degree, feature_set]
+        })
+    leaderboard.sort(key=lambda entry: entry['rmse'])
+
+    # Pareto front over (accuracy, serving cost): no other configuration is at least as good on both
+    # and better on one
+    for entry in leaderboard:
+        entry['pareto'] = not any(
+            other['rmse'] <= entry['rmse'] and other['ns_per_row'] <= entry['ns_per_row']
+            and (other['rmse'] < entry['rmse'] or other['ns_per_row'] < entry['ns_per_row'])
+            for other in leaderboard
+        )
+    return leaderboard, {'rows': len(X), 'folds': folds, 'processes': processes, 'search_seconds': search_seconds}
+
+def print_leaderboard(leaderboard, top=None):
+    width = max((len(entry['config']) for entry in leaderboard[:top]), default=13)
+    print(f"{'':2}{'configuration':<{width}} {'rmse':>8} {'±':>7} {'mae':>8} {'r2':>7} {'ns/row':>8} {'path':>8}")
+    for entry in leaderboard[:top]:
+        marker = '★ ' if entry['pareto'] else '  '
+        print(f"{marker}{entry['config']:<{width}} {entry['rmse']:8.4f} {entry['rmse_std']:7.4f} {entry['mae']:8.4f} "
+              f"{entry['r2']:7.4f} {entry['ns_per_row']:8.1f} {entry['path']:>8}")
+    print("★ = Pareto-optimal: no other configuration is both at least as accurate and at least as cheap to serve")
+    print('Publish a configuration (degree <= 2) with: python model_train.py --config "<configuration>"')
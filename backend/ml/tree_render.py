@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.tree import export_graphviz
+
+# Rendered trees, stored by content hash: <hash>.dot/.svg/.png plus a manifest of the current hashes
+render_dir = 'static/cache/trees'
+manifest_path = os.path.join(render_dir, 'manifest.json')
+
+# Bump when the DOT rewriting below changes so every tree is re-rendered
+RENDER_VERSION = 1
+
+formats = ('svg', 'png')
+mimetypes = {'dot': 'text/vnd.graphviz', 'svg': 'image/svg+xml', 'png': 'image/png'}
+
+# Function to make tree labels user-friendly
+def make_dot_user_friendly(dot_data):
+    # Replace 'gini' with 'Decision based on'
+    dot_data = re.sub(r'gini = [0-9.]+', 'Decision based on', dot_data)
+    # Replace 'samples' with 'Number of cases'
+    dot_data = re.sub(r'samples = [0-9]+', lambda m: f"Number of cases = {m.group().split('=')[1].strip()}", dot_data)
+    # Replace 'value' with 'Outcome'
+    dot_data = re.sub(r'value = \[([0-9]+), ([0-9]+)\]', lambda m: f"Outcome: {m.group(1)} OFF, {m.group(2)} ON", dot_data)
+    return dot_data
+
+# Function to customize tree appearance
+def customize_dot_appearance(dot_data, edge_color="white"):
+    # Add transparent background
+    dot_data = dot_data.replace('digraph Tree {', f'digraph Tree {{\nbgcolor="transparent";\nedge [color="{edge_color}", fontcolor="{edge_color}", pencolor="{edge_color}", arrowhead="normal", color="{edge_color}"];\n')
+    # Ensure all edges are white, including arrowheads
+    dot_data = re.sub(r'(\d+\s*->\s*\d+\s*\[.*?)(?=\])', f'\\1 color="{edge_color}" fontcolor="{edge_color}" pencolor="{edge_color}"', dot_data)
+    # Customize node colors to match the image (orange for OFF, blue for ON)
+    def replace_node_color(match):
+        node_def = match.group(0)
+        if 'ON' in node_def and '0 OFF' in node_def:  # Pure ON nodes (e.g., "0 OFF, 10 ON")
+            return node_def.replace('fillcolor="#', 'fillcolor="#00BFFF')  # Blue
+        else:  # OFF or mixed nodes (e.g., "4104 OFF, 0 ON" or "4244 OFF, 10 ON")
+            return node_def.replace('fillcolor="#', 'fillcolor="#FFA500')  # Orange
+    dot_data = re.sub(r'\d+ \[label=.*?style="filled".*?\]', replace_node_color, dot_data)
+    return dot_data
+
+# Styled DOT source for one fitted DecisionTreeClassifier
+def tree_dot(estimator, feature_names):
+    dot_data = export_graphviz(
+        estimator,
+        out_file=None,
+        feature_names=feature_names,
+        class_names=['OFF', 'ON'],
+        filled=True,
+        rounded=True,
+        special_characters=True
+    )
+    dot_data = make_dot_user_friendly(dot_data)
+    return customize_dot_appearance(dot_data, edge_color="white")
+
+# Content hash of everything the picture depends on: the fitted tree, the feature names and the
+# rendering rules. Equal hashes mean identical images, so rendering can be skipped.
+def tree_hash(estimator, feature_names):
+    tree = estimator.tree_
+    digest = hashlib.sha256(f"{RENDER_VERSION}|{','.join(feature_names)}".encode())
+    for array in (tree.children_left, tree.children_right, tree.feature, tree.threshold, tree.value, tree.n_node_samples):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+def output_path(digest, fmt):
+    return os.path.join(render_dir, f"{digest}.{fmt}")
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# Render one tree's DOT source to every requested format (runs in a worker process)
+def render_one(digest, dot_data, fmts=formats):
+    import graphviz
+    os.makedirs(render_dir, exist_ok=True)
+    _write_atomic(output_path(digest, 'dot'), dot_data.encode())
+    for fmt in fmts:
+        try:
+            image = graphviz.Source(dot_data).pipe(format=fmt)
+        except graphviz.ExecutableNotFound as e:
+            # Does not survive pickling back to the parent process intact
+            raise RuntimeError(str(e)) from None
+        _write_atomic(output_path(digest, fmt), image)
+    return digest
+
+def is_rendered(digest, fmts=formats):
+    return all(os.path.exists(output_path(digest, fmt)) for fmt in ('dot',) + tuple(fmts))
+
+def load_manifest():
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+# Hash of each appliance's tree in the given artifact
+def artifact_hashes(artifact):
+    return {
+        appliance: tree_hash(estimator, artifact['features'])
+        for appliance, estimator in zip(artifact['appliances'], artifact['model'].estimators_)
+    }
+
+# Render the trees of an appliance-model artifact across a process pool, skipping trees whose
+# content hash is already rendered. Returns {appliance: hash} and records it in the manifest.
+def render_trees(artifact, fmts=formats, processes=None):
+    hashes = artifact_hashes(artifact)
+    estimators = dict(zip(artifact['appliances'], artifact['model'].estimators_))
+    pending = {appliance: digest for appliance, digest in hashes.items() if not is_rendered(digest, fmts)}
+
+    for appliance in hashes:
+        if appliance not in pending:
+            print(f"⏭️ {appliance} tree unchanged ({hashes[appliance]}), skipping")
+
+    if pending:
+        # Trees sharing a hash are rendered once
+        jobs = {digest: tree_dot(estimators[appliance], artifact['features']) for appliance, digest in pending.items()}
+        workers = processes or min(len(jobs), os.cpu_count() or 1)
+        errors = {}
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {digest: pool.submit(render_one, digest, dot_data, fmts) for digest, dot_data in jobs.items()}
+                for digest, future in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors[digest] = e
+        else:
+            for digest, dot_data in jobs.items():
+                try:
+                    render_one(digest, dot_data, fmts)
+                except Exception as e:
+                    errors[digest] = e
+
+        for appliance, digest in pending.items():
+            if digest in errors:
+                print(f"❌ Failed to render {appliance} tree: {errors[digest]}")
+                hashes.pop(appliance)
+            else:
+                print(f"✅ Rendered {appliance} tree ({digest})")
+
+    record_manifest(hashes)
+    return hashes
+
+# Render one appliance's tree inline, e.g. when a web worker fills in a missing image on demand.
+# Raises when rendering fails; returns the tree's hash.
+def render_appliance(artifact, appliance, fmts=formats):
+    estimator = dict(zip(artifact['appliances'], artifact['model'].estimators_))[appliance]
+    digest = tree_hash(estimator, artifact['features'])
+    render_one(digest, tree_dot(estimator, artifact['features']), fmts)
+    record_manifest({appliance: digest})
+    return digest
+
+def record_manifest(hashes):
+    os.makedirs(render_dir, exist_ok=True)
+    manifest = {**load_manifest(), **hashes}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2).encode())
@@ -1,12 +1,15 @@
-import pandas as pd
 import numpy as np
-import pickle
 import os
+import argparse
 from sklearn.linear_model import BayesianRidge
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.preprocessing import StandardScaler, PolynomialFeatures
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error
+from ml.features import FEATURE_NAMES, FEATURE_SETS, feature_indices
+from ml.ingest import iter_feature_batches
+from ml.bayesian import compile_predictor, predict_compiled, predict_std_compiled
+from ml.incremental import empty_stats, update_stats, load_stats, scaler_from_stats, solve_bayesian_ridge, publish_model
 
 # Directory for saving models
 save_dir = 'models'
@@ -15,45 +18,45 @@ os.makedirs(save_dir, exist_ok=True)
 # Path to dataset
 dataset_path = 'static/powerconsumption_aggregated.csv'
 
-# Load and preprocess data
+# Sufficient statistics for incremental retraining
+stats_path = os.path.join(save_dir, 'bayesian_stats.npz')
+
+# Production model settings; --config / --degree / --alpha-1 ... override them and the choice is
+# stored with the statistics, so --incremental keeps solving the same model
+DEFAULT_DEGREE = 2
+DEFAULT_PRIORS = {'alpha_1': 1e-6, 'alpha_2': 1e-6, 'lambda_1': 1e-6, 'lambda_2': 1e-6}
+
+# Settings recorded in saved statistics (older files without them used the defaults)
+def stats_settings(stats):
+    degree = int(stats['degree']) if 'degree' in stats else DEFAULT_DEGREE
+    priors = {name: float(stats[name]) if name in stats else value for name, value in DEFAULT_PRIORS.items()}
+    return degree, priors
+
+def settings_stats(degree, priors):
+    return {'degree': np.int64(degree), **{name: np.float64(value) for name, value in priors.items()}}
+
+# Load and preprocess data (streamed in chunks with compact dtypes, features built per chunk)
 def load_data_from_csv(path):
-    df = pd.read_csv(path)
-    
-    # Convert Datetime to datetime object
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
-    
-    # Extract hour, month, day, and new features
-    df['Hour'] = df['Datetime'].dt.hour
-    df['Month'] = df['Datetime'].dt.month
-    df['Day'] = df['Datetime'].dt.day
-    df['Is_Weekday'] = df['Datetime'].dt.weekday.apply(lambda x: 1 if x < 5 else 0)
-    df['Is_Evening'] = df['Hour'].apply(lambda x: 1 if 17 <= x <= 21 else 0)
-    
-    # Cyclical encoding for Hour
-    df['Hour_sin'] = np.sin(2 * np.pi * df['Hour'] / 24)
-    df['Hour_cos'] = np.cos(2 * np.pi * df['Hour'] / 24)
-    
-    # Interaction term
-    df['Temp_Hour_Interaction'] = df['Temperature'] * df['Hour']
-    df['Temp_Evening_Interaction'] = df['Temperature'] * df['Is_Evening']
-    
-    # Extract features and target
-    X = df[['Temperature', 'Humidity', 'WindSpeed', 'Hour', 'Hour_sin', 'Hour_cos', 'Month', 'Day', 'Is_Weekday', 'Is_Evening', 'Temp_Hour_Interaction', 'Temp_Evening_Interaction']].values
-    y = df['Consumption'].values
-    
-    return X, y
+    X_batches, y_batches = [], []
+    for X_batch, y_batch in iter_feature_batches(path):
+        X_batches.append(X_batch)
+        y_batches.append(y_batch)
+    return np.concatenate(X_batches), np.concatenate(y_batches)
 
-# Train and save the model
-def train_bayesian_model():
+# Train and save the model on the given engineered feature columns (all of them by default), with
+# the given polynomial degree (<= 2, so the API can serve it compiled) and priors
+def train_bayesian_model(features=None, degree=DEFAULT_DEGREE, priors=DEFAULT_PRIORS):
     # Load data
-    X, y = load_data_from_csv(dataset_path)
+    X_raw, y = load_data_from_csv(dataset_path)
+    if features is None:
+        features = np.arange(len(FEATURE_NAMES))
     
     # Add polynomial features (e.g., Hour^2, Temperature^2)
-    poly = PolynomialFeatures(degree=2, include_bias=False)
-    X = poly.fit_transform(X)
+    poly = PolynomialFeatures(degree=degree, include_bias=False)
+    X = poly.fit_transform(X_raw[:, features])
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split data (raw features are kept for checking the compiled predictor)
+    X_train, X_test, y_train, y_test, _, X_test_raw = train_test_split(X, y, X_raw, test_size=0.2, random_state=42)
     
     # Standardize features
     scaler = MinMaxScaler()
@@ -61,7 +64,7 @@ def train_bayesian_model():
     X_test_scaled = scaler.transform(X_test)
     
     # Initialize and train Bayesian Ridge model
-    model = BayesianRidge(alpha_1=1e-6, lambda_1=1e-6)  # Tune regularization
+    model = BayesianRidge(**priors)  # Tune regularization (model_train.py --search)
     model.fit(X_train_scaled, y_train)
     
     # Evaluate model
@@ -70,24 +73,94 @@ def train_bayesian_model():
     print(f"Mean Squared Error on test set: {mse:.4f}")
     
     # Feature coefficients
-    feature_names = poly.get_feature_names_out(['Temperature', 'Humidity', 'WindSpeed', 'Hour', 'Hour_sin', 'Hour_cos', 'Month', 'Day', 'Is_Weekday', 'Is_Evening', 'Temp_Hour_Interaction', 'Temp_Evening_Interaction'])
+    feature_names = poly.get_feature_names_out(np.array(FEATURE_NAMES)[features])
     for name, coef in zip(feature_names, model.coef_):
         print(f"Feature {name}: {coef:.4f}")
     
-    # Save model, scaler, and polynomial transformer
-    model_path = os.path.join(save_dir, 'bayesian_model.pkl')
-    scaler_path = os.path.join(save_dir, 'scaler.pkl')
-    poly_path = os.path.join(save_dir, 'poly.pkl')
+    # Check the closed-form predictor served by the API against the sklearn path (it is given the
+    # full feature matrix, as the API builds it, and selects the trained columns itself)
+    compiled = compile_predictor(poly, scaler, model, features=features)
+    _, y_std = model.predict(X_test_scaled, return_std=True)
+    if not np.allclose(predict_compiled(compiled, X_test_raw), y_pred, rtol=1e-6, atol=1e-6):
+        raise RuntimeError("Compiled predictor does not match the sklearn pipeline")
+    if not np.allclose(predict_std_compiled(compiled, X_test_raw), y_std, rtol=1e-6, atol=1e-6):
+        raise RuntimeError("Compiled predictive std does not match the sklearn pipeline")
     
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
-    with open(scaler_path, 'wb') as f:
-        pickle.dump(scaler, f)
-    with open(poly_path, 'wb') as f:
-        pickle.dump(poly, f)
+    # Save model, scaler, polynomial transformer, compiled predictor and the training-set statistics
+    # that later incremental runs continue from (with the feature subset, so they keep using it)
+    previous_version = load_stats(stats_path)['version'] if os.path.exists(stats_path) else 0
+    stats = update_stats({**empty_stats(X.shape[1]), 'version': np.int64(previous_version), 'features': features, **settings_stats(degree, priors)}, X_train, y_train)
+    stats = publish_model(save_dir, poly, scaler, model, stats)
     
-    print("✅ Bayesian model trained and saved.")
+    print(f"✅ Bayesian model trained and saved (version {stats['version']}).")
+
+# Fold new telemetry into the saved statistics and re-solve the model from them; the cost depends
+# on the size of the new files, not on the history already folded in
+def train_incremental(paths):
+    stats = load_stats(stats_path) if os.path.exists(stats_path) else None
+    features = stats['features'] if stats is not None and 'features' in stats else np.arange(len(FEATURE_NAMES))
+    degree, priors = stats_settings(stats or {})
+    poly = PolynomialFeatures(degree=degree, include_bias=False).fit(np.zeros((1, len(features))))
+    if stats is None:
+        stats = {**empty_stats(poly.n_output_features_), 'features': features, **settings_stats(degree, priors)}
+    
+    new_rows = 0
+    for path in paths:
+        for X_batch, y_batch in iter_feature_batches(path):
+            stats = update_stats(stats, poly.transform(X_batch[:, features]), y_batch)
+            new_rows += len(X_batch)
+    
+    scaler = scaler_from_stats(stats)
+    model = solve_bayesian_ridge(stats, scaler, **priors)
+    stats = publish_model(save_dir, poly, scaler, model, stats)
+    print(f"✅ Folded {new_rows} new rows ({stats['n']} total); published model version {stats['version']}.")
 
 # Run the training
 if __name__ == "__main__":
-    train_bayesian_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the Bayesian energy model")
+    parser.add_argument('--incremental', nargs='+', metavar='CSV', help="fold these CSVs into the saved statistics instead of refitting from scratch")
+    parser.add_argument('--features', help=f"engineered features to train on: one of {', '.join(FEATURE_SETS)} or comma-separated names (default all)")
+    parser.add_argument('--degree', type=int, choices=[1, 2], help=f"polynomial degree to train (default {DEFAULT_DEGREE}; the compiled predictor serves up to 2)")
+    for name, value in DEFAULT_PRIORS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=float, help=f"BayesianRidge {name} prior (default {value:g})")
+    parser.add_argument('--config', help="train a configuration from the --search leaderboard, e.g. \"degree=2 features=all alpha_1=1e-06 alpha_2=1e-06 lambda_1=1 lambda_2=1e-06\"; the options above override its settings")
+    parser.add_argument('--search', action='store_true', help="rank polynomial degrees, priors and feature sets by time-based CV accuracy and inference cost; saves nothing")
+    parser.add_argument('--degrees', default='1,2,3', help="polynomial degrees to search (default 1,2,3)")
+    parser.add_argument('--feature-sets', default=','.join(FEATURE_SETS), help="feature sets to search (default all of them)")
+    parser.add_argument('--folds', type=int, default=5, help="expanding-window time folds (default 5)")
+    parser.add_argument('--processes', type=int, help="search processes (default one per core)")
+    parser.add_argument('--top', type=int, help="only print the best N configurations")
+    parser.add_argument('--output', help="also save the leaderboard as JSON (benchmarks/report.py format)")
+    args = parser.parse_args()
+    
+    if args.search:
+        from ml.model_search import run_search, print_leaderboard
+        degrees = tuple(int(degree) for degree in args.degrees.split(','))
+        unknown = set(args.feature_sets.split(',')) - set(FEATURE_SETS)
+        if unknown:
+            parser.error(f"unknown feature sets: {', '.join(sorted(unknown))}")
+        feature_sets = {name: FEATURE_SETS[name] for name in args.feature_sets.split(',')}
+        leaderboard, summary = run_search(degrees=degrees, feature_sets=feature_sets, folds=args.folds, processes=args.processes)
+        print_leaderboard(leaderboard, top=args.top)
+        print(f"✅ Searched {len(leaderboard)} configurations in {summary['search_seconds']:.1f}s")
+        if args.output:
+            from benchmarks.report import save_results
+            save_results('model_search', {**vars(args), **summary}, {entry['config']: entry for entry in leaderboard}, path=args.output)
+    elif args.incremental:
+        train_incremental(args.incremental)
+    else:
+        degree, feature_set, priors = DEFAULT_DEGREE, 'all', dict(DEFAULT_PRIORS)
+        try:
+            if args.config:
+                from ml.model_search import parse_config_key
+                degree, feature_set, config_priors = parse_config_key(args.config)
+                priors.update(config_priors)
+            features = feature_indices(args.features or feature_set)
+        except ValueError as e:
+            parser.error(str(e))
+        degree = args.degree or degree
+        if degree > 2:
+            parser.error("only degree 1 or 2 can be served by the compiled predictor")
+        priors.update({name: getattr(args, name) for name in DEFAULT_PRIORS if getattr(args, name) is not None})
+        print(f"⚙️ Training degree {degree} on features {args.features or feature_set} with " + ", ".join(f"{name}={value:g}" for name, value in priors.items()))
+        train_bayesian_model(features, degree, priors)
\ No newline at end of file
@@ -0,0 +1,165 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from urllib.request import urlopen
+from zoneinfo import ZoneInfo
+import numpy as np
+from ml.features import build_features, calendar_columns, forecast_timestamps
+from ml.bayesian import predict_compiled, predict_std_compiled
+from ml.appliance_model import get_appliance_model, features
+from routes import energy_prediction
+from routes.energy_prediction import INTERVAL_Z
+from db import connection
+from db.precomputed import ensure_precomputed_indexes, store_region_rows, users_per_region, record_run
+
+# Day-ahead precomputation per weather region: once an hour, predict each region's 24-hour
+# consumption and the optimizer's ideal appliance states for every hour, and store one row per
+# region and local date for the routes to serve. Neither model has per-user inputs, so every
+# user in a region shares its row; only the suggestions (ideal vs. saved states) are per user.
+
+# Sample Open-Meteo responses standing in for the live API
+fixture_path = 'static/forecast_fixture.json'
+open_meteo_url = ("https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}"
+                  "&hourly=temperature_2m,relative_humidity_2m,wind_speed_10m&timezone=auto&start_date={date}&end_date={date}")
+
+# Regions with their coordinates and timezone (and, in the fixture, a forecast)
+def load_regions(path=fixture_path):
+    with open(path) as f:
+        return json.load(f)['regions']
+
+# 24 hourly values from local midnight, from the fixture or from Open-Meteo
+def fetch_forecast(region, source, start):
+    if source == 'fixture':
+        return region['hourly']
+    url = open_meteo_url.format(latitude=region['latitude'], longitude=region['longitude'], date=start.strftime('%Y-%m-%d'))
+    with urlopen(url, timeout=10) as response:
+        return json.load(response)['hourly']
+
+# Same conversion WeatherCard.jsx applies before the browser posts a forecast
+def model_inputs(hourly):
+    winds = np.round(np.asarray(hourly['wind_speed_10m'], dtype=np.float64) * 3.6, 1)
+    return np.asarray(hourly['temperature_2m'], dtype=np.float64), np.asarray(hourly['relative_humidity_2m'], dtype=np.float64), winds
+
+def local_midnight(tz_name, now):
+    return now.astimezone(ZoneInfo(tz_name)).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+
+# Stable shard assignment, so every run (and every host) splits the regions the same way
+def shard_of(region_name, shards):
+    return zlib.crc32(region_name.encode()) % shards
+
+# Predict every region in one stacked pass through each model and build the stored rows
+def compute_rows(names, regions, forecasts, counts, now):
+    starts = [local_midnight(regions[name]['timezone'], now) for name in names]
+    temperatures, humidities, winds = (np.concatenate(column) for column in zip(*[model_inputs(forecasts[name]) for name in names]))
+    timestamps = np.concatenate([forecast_timestamps(start, [24]) for start in starts])
+
+    timings = {}
+    started = time.perf_counter()
+    predictor = energy_prediction.predictor
+    X = build_features(temperatures, humidities, winds, timestamps)
+    predictions = predict_compiled(predictor, X)
+    std = predict_std_compiled(predictor, X) if 'std_factor' in predictor else None
+    timings['predict'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hour, month, day, _ = calendar_columns(timestamps)
+    conditions = dict(zip(['Day', 'Month', 'Hour', 'Temperature', 'Humidity', 'WindSpeed'], [day, month, hour, temperatures, humidities, winds]))
+    evaluator = get_appliance_model()['evaluator']
+    states = evaluator.predict_batch(np.column_stack([conditions[field] for field in features]))
+    timings['trees'] = time.perf_counter() - started
+
+    generated_at = datetime.now(timezone.utc)
+    model_version = int(predictor.get('version', 0))
+    rows = []
+    for i, (name, start) in enumerate(zip(names, starts)):
+        hours = slice(i * 24, (i + 1) * 24)
+        row = {
+            "region": name,
+            "date": start.strftime('%Y-%m-%d'),
+            "timezone": regions[name]['timezone'],
+            "generated_at": generated_at,
+            "model_version": model_version,
+            "users": counts.get(name, 0),
+            "forecast": {"temperatures": temperatures[hours].tolist(), "humidities": humidities[hours].tolist(), "winds": winds[hours].tolist()},
+            "predictions": predictions[hours].tolist(),
+            "ideal_states": {appliance: states[hours, j].tolist() for j, appliance in enumerate(evaluator.names)}
+        }
+        if std is not None:
+            row.update({
+                "std": std[hours].tolist(),
+                "lower": (predictions[hours] - INTERVAL_Z * std[hours]).tolist(),
+                "upper": (predictions[hours] + INTERVAL_Z * std[hours]).tolist()
+            })
+        rows.append(row)
+    return rows, timings
+
+# One shard of one run: fetch forecasts, predict, store, and record the timings
+def run_shard(shard, shards, source, all_regions):
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    regions = load_regions()
+    counts = users_per_region()
+    names = sorted(name for name in regions
+                   if shard_of(name, shards) == shard and (all_regions or counts.get(name)))
+
+    stats = {"started_at": started_at, "shard": shard, "shards": shards, "regions": len(names),
+             "users": sum(counts.get(name, 0) for name in names), "seconds": {}}
+    if names:
+        fetch_started = time.perf_counter()
+        forecasts = {name: fetch_forecast(regions[name], source, local_midnight(regions[name]['timezone'], started_at)) for name in names}
+        stats["seconds"]["forecasts"] = time.perf_counter() - fetch_started
+
+        rows, timings = compute_rows(names, regions, forecasts, counts, started_at)
+        stats["seconds"].update(timings)
+
+        store_started = time.perf_counter()
+        store_region_rows(rows)
+        stats["seconds"]["store"] = time.perf_counter() - store_started
+
+    stats["seconds"]["total"] = time.perf_counter() - started
+    record_run(stats)
+    return stats
+
+# Run every shard, in parallel worker processes when there is more than one (forked after the
+# models are loaded, so they are shared copy-on-write). MongoClient is not fork-safe, so each
+# worker opens its own client instead of using the one inherited from this process.
+def run_once(shards, processes, source, all_regions, only_shard=None):
+    energy_prediction.reload_if_published()
+    get_appliance_model()
+    targets = [only_shard] if only_shard is not None else list(range(shards))
+    jobs = [(shard, shards, source, all_regions) for shard in targets]
+    if processes > 1 and len(jobs) > 1:
+        with multiprocessing.get_context('fork').Pool(min(processes, len(jobs)), initializer=connection.reconnect) as pool:
+            results = pool.starmap(run_shard, jobs)
+    else:
+        results = [run_shard(*job) for job in jobs]
+
+    for stats in results:
+        seconds = ", ".join(f"{stage} {value * 1000:.1f} ms" for stage, value in stats["seconds"].items())
+        print(f"✅ Shard {stats['shard'] + 1}/{stats['shards']}: {stats['regions']} regions, {stats['users']} users ({seconds})")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute day-ahead predictions and ideal appliance states per region")
+    parser.add_argument('--once', action='store_true', help="run a single pass instead of every --interval seconds")
+    parser.add_argument('--interval', type=int, default=3600, help="seconds between runs, aligned to the clock (default hourly)")
+    parser.add_argument('--shards', type=int, default=int(os.getenv("PRECOMPUTE_SHARDS", "1")), help="split regions into this many shards")
+    parser.add_argument('--shard', type=int, help="only run this shard (e.g. one shard per host)")
+    parser.add_argument('--processes', type=int, default=int(os.getenv("PRECOMPUTE_PROCESSES", "1")), help="worker processes for the shards")
+    parser.add_argument('--source', choices=['fixture', 'open-meteo'], default=os.getenv("FORECAST_SOURCE", "fixture"))
+    parser.add_argument('--all-regions', action='store_true', help="also precompute regions without any users")
+    args = parser.parse_args()
+
+    ensure_precomputed_indexes()
+    while True:
+        try:
+            run_once(args.shards, args.processes, args.source, args.all_regions, args.shard)
+        except Exception as e:
+            print(f"❌ Precompute run failed: {e}")
+        if args.once:
+            break
+        time.sleep(args.interval - time.time() % args.interval)
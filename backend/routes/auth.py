@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
-from db.connection import users_collection
-from werkzeug.security import generate_password_hash, check_password_hash
-from bson.objectid import ObjectId
+from db.users import user_exists, create_user, get_user_record, get_profile
+from utils.password_pool import password_pool, PoolSaturated
+from utils.metrics import stage
+from utils.session_tokens import issue_token, require_session, session_allows
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -14,18 +15,28 @@ def signup():
     first_name = data.get("firstName")
     last_name = data.get("lastName")
     gender = data.get("gender")
+    region = data.get("region")  # weather region for precomputed forecasts (optional)
 
-    # Check if user already exists
-    if users_collection.find_one({"email": email}):
+    # Check if user already exists (before paying for the password hash)
+    if user_exists(email):
         return jsonify({"message": "User already exists"}), 409
 
-    # Insert user into the collection with hashed password
-    users_collection.insert_one({
+    # Hash in the worker pool; shed load (pool full, or the hash timed out) instead of queueing
+    # unboundedly behind slow hashes
+    try:
+        with stage("password_hash"):
+            password_hash = password_pool.hash_password(password)
+    except PoolSaturated:
+        return jsonify({"message": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
+
+    # Insert user into the collection with hashed password; the unique email index catches races
+    created = create_user({
         "email": email,
-        "password": generate_password_hash(password),
+        "password": password_hash,
         "firstName": first_name,
         "lastName": last_name,
         "gender": gender,
+        "region": region,
         "TV": 0,
         "AC": 0, 
         "Fridge": 0, 
@@ -34,6 +45,8 @@ def signup():
         "Light": 0,
         "Total": 0
     })
+    if not created:
+        return jsonify({"message": "User already exists"}), 409
     return jsonify({"message": "User created successfully!"}), 201
 
 # Login route
@@ -43,14 +56,19 @@ def login():
     email = data.get("email")
     password = data.get("password")
 
-    # Check if the user exists
-    user = users_collection.find_one({"email": email})
+    # Check if the user exists (projected and cached read)
+    user = get_user_record(email)
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    # Verify password
-    if not check_password_hash(user["password"], password):
+    # Verify password in the worker pool (PoolSaturated also covers HashTimeout)
+    try:
+        with stage("password_check"):
+            valid = password_pool.check_password(user["password"], password)
+    except PoolSaturated:
+        return jsonify({"message": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
+    if not valid:
         return jsonify({"message": "Invalid credentials"}), 401
 
     # Send back user details along with the message on successful login
@@ -66,5 +84,22 @@ def login():
         "Oven": user["Oven"], 
         "Fan": user["Fan"], 
         "Light": user["Light"],
-        "Total": user["Total"]         
+        "Total": user["Total"],
+        "region": user.get("region"),
+        "token": issue_token(user["email"])
     }), 200
+
+# Profile and saved appliance states for the dashboard
+@auth_bp.route("/profile", methods=["GET"])
+@require_session
+def profile():
+    email = request.args.get("email")
+    if not email:
+        return jsonify({"message": "Email is required"}), 400
+    if not session_allows(email):
+        return jsonify({"message": "Session does not match this user"}), 403
+
+    user = get_profile(email)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    return jsonify(user), 200
@@ -0,0 +1,56 @@
+import math
+from flask import Blueprint, request, jsonify
+from ml.csp import appliances, correct_states
+
+correct_states_bp = Blueprint('correct_states', __name__)
+
+# Fault correction route: nearest state set that satisfies the CSP constraints
+@correct_states_bp.route('/correct_states', methods=['POST'])
+def correct_appliance_states():
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Content-Type must be application/json'}), 400
+
+        data = request.get_json()
+        required_fields = ['Temperature', 'Humidity', 'Hour', 'current_states']
+        if not data or not all(field in data for field in required_fields):
+            return jsonify({'error': 'Missing required fields: ' + ', '.join(set(required_fields) - set(data or {}))}), 400
+
+        current_states = data['current_states']
+        if not isinstance(current_states, dict):
+            return jsonify({'error': 'current_states must be an object mapping appliance names to 0 (OFF) or 1 (ON)'}), 400
+        if not all(appliance in appliances for appliance in current_states):
+            return jsonify({'error': 'Invalid appliance in current_states: ' + ', '.join(set(current_states) - set(appliances))}), 400
+
+        # Validate current_states values (must be 0 or 1)
+        for appliance, state in current_states.items():
+            if state not in [0, 1]:
+                return jsonify({'error': f'Invalid state for {appliance}: must be 0 (OFF) or 1 (ON)'}), 400
+
+        # Conditions must be finite numbers (numeric strings are accepted)
+        conditions = {}
+        for field in ['Temperature', 'Humidity', 'Hour']:
+            try:
+                conditions[field] = float(data[field])
+            except (TypeError, ValueError):
+                conditions[field] = math.nan
+            if isinstance(data[field], bool) or not math.isfinite(conditions[field]):
+                return jsonify({'error': f'{field} must be a number'}), 400
+        corrected = correct_states(conditions, current_states)
+
+        # Report the toggles needed to get there (missing appliances count as OFF)
+        changes = []
+        for appliance in appliances:
+            if corrected[appliance] != current_states.get(appliance, 0):
+                changes.append(f"Turn {'ON' if corrected[appliance] else 'OFF'} {appliance}")
+
+        return jsonify({
+            'states': corrected,
+            'changes': changes,
+            'message': 'Appliance states already satisfy all constraints.' if not changes else 'Appliance states corrected.'
+        }), 200
+
+    except ValueError as ve:
+        return jsonify({'error': f'Invalid input: {str(ve)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
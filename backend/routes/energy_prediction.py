@@ -1,16 +1,57 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 import pickle
 import numpy as np
 from datetime import datetime
 import os
+import time
+import hashlib
+from ml.features import build_features, forecast_timestamps
+from db.precomputed import request_row
+from utils.metrics import stage
+from utils.session_tokens import require_admin, require_session
+from utils.ttl_cache import TTLCache
+from utils.shared_cache import SQLiteCache
+from ml.bayesian import compile_predictor, load_compiled_predictor, predict_compiled, predict_std_compiled
+from ml.incremental import load_stats
 
-bayesian_model = None
-scaler = None
-poly = None
+predictor = None
+
+compiled_path = 'models/bayesian_compiled.npz'
+
+# Seconds between checks for a newly published model version
+MODEL_CHECK_INTERVAL = 30
+_last_model_check = 0.0
+_loaded_mtime = None
+
+# Forecasts are rounded to this step before keying and predicting (Open-Meteo reports one decimal)
+CACHE_QUANTUM = float(os.getenv("PREDICTION_CACHE_QUANTUM", "0.1"))
+
+# Per-process LRU of forecast -> predictions; households in one city send near-identical forecasts
+prediction_cache = TTLCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "900"))
+)
+
+# Optional SQLite file shared by every worker, consulted on a local miss
+shared_cache_path = os.getenv("PREDICTION_CACHE_PATH")
+shared_prediction_cache = SQLiteCache(
+    shared_cache_path,
+    maxsize=int(os.getenv("PREDICTION_CACHE_SHARED_SIZE", "100000")),
+    ttl=float(os.getenv("PREDICTION_CACHE_TTL", "900"))
+) if shared_cache_path else None
 
 def load_model_and_scaler():
-    global bayesian_model, scaler, poly
+    global predictor, _loaded_mtime
+    # Cached predictions belong to the previous model
+    prediction_cache.clear()
     try:
+        if os.path.exists(compiled_path):
+            _loaded_mtime = os.stat(compiled_path).st_mtime_ns
+            predictor = load_compiled_predictor(compiled_path)
+            print(f"✅ Compiled Bayesian predictor loaded successfully (version {int(predictor.get('version', 0))}).")
+            return
+
+        # No exported predictor yet, so compile one from the pickled sklearn objects
         model_path = 'models/bayesian_model.pkl'
         scaler_path = 'models/scaler.pkl'
         poly_path = 'models/poly.pkl'
@@ -24,68 +65,264 @@ def load_model_and_scaler():
             scaler = pickle.load(f)
         with open(poly_path, 'rb') as f:
             poly = pickle.load(f)
-        print("✅ Bayesian model, scaler, and poly loaded successfully.")
+        # The feature subset the model was trained on is recorded with the training statistics
+        stats_path = 'models/bayesian_stats.npz'
+        features = load_stats(stats_path).get('features') if os.path.exists(stats_path) else None
+        predictor = compile_predictor(poly, scaler, bayesian_model, features=features)
+        print("✅ Bayesian model, scaler, and poly loaded and compiled successfully.")
     except Exception as e:
         print(f"❌ Error loading model, scaler, or poly: {e}")
 
 load_model_and_scaler()
 
+# Pick up a model published by incremental retraining (the file is swapped in atomically)
+def reload_if_published():
+    global _last_model_check
+    now = time.monotonic()
+    if now - _last_model_check < MODEL_CHECK_INTERVAL:
+        return
+    _last_model_check = now
+    if os.path.exists(compiled_path) and os.stat(compiled_path).st_mtime_ns != _loaded_mtime:
+        load_model_and_scaler()
+
 energy_prediction_bp = Blueprint('energy_prediction', __name__)
 
+# Evaluate the compiled poly -> scaler -> model pipeline once over a stacked feature matrix
+def predict_consumption(input_array):
+    return predict_compiled(predictor, input_array)
+
+# 95% interval half-width in standard deviations
+INTERVAL_Z = 1.96
+
+def uncertainty_available():
+    return 'std_factor' in predictor
+
+# Accepted range of each forecast field; values outside it (or NaN) would overflow the quantized
+# cache key, so they are rejected before quantizing
+FORECAST_LIMITS = {'temperatures': (-100.0, 100.0), 'humidities': (0.0, 100.0), 'winds': (0.0, 500.0)}
+
+# Check that each forecast field is a list of finite, in-range numbers (numeric strings, as the
+# weather card stores winds, are accepted); returns an error message or None
+def forecast_error(forecast):
+    for field, (low, high) in FORECAST_LIMITS.items():
+        values = forecast[field]
+        try:
+            if not isinstance(values, list) or any(value is None or isinstance(value, (bool, list, dict)) for value in values):
+                raise TypeError
+            values = np.array([float(value) for value in values])
+        except (TypeError, ValueError, OverflowError):
+            return f'{field} must be a list of numbers'
+        if not (np.isfinite(values).all() and (values >= low).all() and (values <= high).all()):
+            return f'{field} values must be finite and between {low:g} and {high:g}'
+    return None
+
+def quantize(values):
+    return np.round(np.asarray(values, dtype=np.float64) / CACHE_QUANTUM).astype(np.int64)
+
+# Cache key: model version, the calendar fields of the start date, and the quantized forecast
+def forecast_key(temperatures, humidities, winds, start):
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (temperatures, humidities, winds):
+        digest.update(values.tobytes())
+    model_tag = f"{int(predictor.get('version', 0))}.{_loaded_mtime}"
+    return f"{model_tag}:{start.month}-{start.day}-{start.weekday()}:{digest.hexdigest()}"
+
+def cache_lookup(key):
+    result = prediction_cache.get(key)
+    if result is None and shared_prediction_cache is not None:
+        result = shared_prediction_cache.get(key)
+        if result is not None:
+            prediction_cache.set(key, result)
+    return result
+
+def cache_store(key, result):
+    prediction_cache.set(key, result)
+    if shared_prediction_cache is not None:
+        shared_prediction_cache.set(key, result)
+
+# Predict stacked quantized forecasts, with std only when it was asked for (it costs several
+# times the prediction itself)
+def forecast_results(temperatures, humidities, winds, lengths, start, with_std=False):
+    with stage("features"):
+        input_array = build_features(temperatures * CACHE_QUANTUM, humidities * CACHE_QUANTUM, winds * CACHE_QUANTUM, forecast_timestamps(start, lengths))
+    with stage("predict"):
+        columns = {'predictions': predict_consumption(input_array)}
+    if with_std:
+        with stage("predict_std"):
+            columns['std'] = predict_std_compiled(predictor, input_array)
+
+    split_points = np.cumsum(lengths)[:-1]
+    results = [{} for _ in lengths]
+    for name, values in columns.items():
+        for result, part in zip(results, np.split(values, split_points)):
+            result[name] = part.tolist()
+    return results
+
+# Predictions (and std when with_std) for each forecast, served from the cache where possible and
+# computed in one stacked call for the rest. Entries cached without std are misses for with_std.
+def cached_forecasts(forecasts, start, with_std=False):
+    quantized = [tuple(quantize(forecast[field]) for field in ('temperatures', 'humidities', 'winds')) for forecast in forecasts]
+    with stage("prediction_cache_lookup"):
+        keys = [forecast_key(*values, start) for values in quantized]
+        results = [cache_lookup(key) for key in keys]
+
+    missing = [i for i, result in enumerate(results) if result is None or (with_std and 'std' not in result)]
+    if missing:
+        stacked = [np.concatenate([quantized[i][column] for i in missing]) for column in range(3)]
+        computed = forecast_results(*stacked, [len(quantized[i][0]) for i in missing], start, with_std=with_std)
+        for i, result in zip(missing, computed):
+            cache_store(keys[i], result)
+            results[i] = result
+    return results
+
+# Opt-in uncertainty band around a cached or fresh result
+def uncertainty_fields(result):
+    predictions, std = np.asarray(result['predictions']), np.asarray(result['std'])
+    return {'std': result['std'], 'lower': (predictions - INTERVAL_Z * std).tolist(), 'upper': (predictions + INTERVAL_Z * std).tolist()}
+
+@energy_prediction_bp.route('/predict_energy_consumption/cache', methods=['GET'])
+@require_admin
+def prediction_cache_stats():
+    # The in-process tier is per worker, so it is labelled with the pid that answered; the shared
+    # tier's counters are totals across every process using the file
+    stats = {'local': {'pid': os.getpid(), 'size': len(prediction_cache), 'hits': prediction_cache.hits, 'misses': prediction_cache.misses}}
+    if shared_prediction_cache is not None:
+        stats['shared'] = {'size': len(shared_prediction_cache), **shared_prediction_cache.stats()}
+    return jsonify(stats), 200
+
+# Whether a request forecast is the one a precomputed row was made from (to the cache quantum)
+def same_forecast(data, row):
+    return all(
+        np.array_equal(quantize(data[field]), quantize(row['forecast'][field]))
+        for field in ('temperatures', 'humidities', 'winds')
+    )
+
+# Response body for a precomputed region row (predictions from the row's local midnight)
+def precomputed_response(row):
+    date = datetime.strptime(row['date'], '%Y-%m-%d')
+    return {
+        'status': 'success',
+        'predictions': row['predictions'],
+        'used_time': {
+            'Month': date.month,
+            'Day': date.day
+        },
+        'region': row['region'],
+        'generated_at': row['generated_at'].isoformat()
+    }
+
 @energy_prediction_bp.route('/predict_energy_consumption', methods=['POST'])
+@require_session
 def predict_energy_consumption():
     try:
-        if bayesian_model is None or scaler is None or poly is None:
+        reload_if_published()
+        if predictor is None:
             return jsonify({'error': 'Model, scaler, or poly transformer not loaded'}), 500
 
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No input data provided'}), 400
 
+        region = data.get('region')
+        if region is not None and not isinstance(region, str):
+            return jsonify({'error': 'region must be a string'}), 400
+
         required_fields = ['temperatures', 'humidities', 'winds']
-        if not all(field in data for field in required_fields):
+        sent_forecast = any(field in data for field in required_fields)
+        if sent_forecast:
+            if not all(field in data for field in required_fields):
+                return jsonify({'error': f'Missing required fields: {", ".join(required_fields)}'}), 400
+            error = forecast_error(data)
+            if error:
+                return jsonify({'error': error}), 400
+            if not (len(data['temperatures']) == len(data['humidities']) == len(data['winds']) == 24):
+                return jsonify({'error': 'Each of temperatures, humidities, and winds must have 24 values'}), 400
+
+        # Today's precomputed row for the region (from the request, or the signed-in user's profile)
+        # answers requests without a forecast and those sending the forecast it was made from; any
+        # other forecast is predicted here
+        row = request_row(region, g.session_email)
+        if row is not None and (not sent_forecast or same_forecast(data, row)) and (not data.get('return_std') or 'std' in row):
+            response = precomputed_response(row)
+            if data.get('return_std'):
+                response.update({name: row[name] for name in ('std', 'lower', 'upper')})
+            return jsonify(response), 200
+
+        if not sent_forecast:
             return jsonify({'error': f'Missing required fields: {", ".join(required_fields)}'}), 400
 
-        temperatures = data['temperatures']
-        humidities = data['humidities']
-        winds = data['winds']
-
-        if not (len(temperatures) == len(humidities) == len(winds) == 24):
-            return jsonify({'error': 'Each of temperatures, humidities, and winds must have 24 values'}), 400
-
-        now = datetime.now()
-        month = now.month
-        day = now.day
-
-        inputs = []
-        for hour in range(24):
-            inputs.append([
-                temperatures[hour],
-                humidities[hour],
-                winds[hour],
-                hour,
-                np.sin(2 * np.pi * hour / 24),
-                np.cos(2 * np.pi * hour / 24),
-                month,
-                day,
-                1 if datetime.now().weekday() < 5 else 0,
-                1 if 17 <= hour <= 21 else 0,
-                temperatures[hour] * hour,
-                temperatures[hour] * (1 if 17 <= hour <= 21 else 0)
-            ])
-
-        input_array = np.array(inputs)
-        input_array = poly.transform(input_array)
-        input_scaled = scaler.transform(input_array)
-        predictions = bayesian_model.predict(input_scaled)
-        return jsonify({
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        month = start.month
+        day = start.day
+
+        if data.get('return_std') and not uncertainty_available():
+            return jsonify({'error': 'Loaded model has no uncertainty terms; re-run model_train.py'}), 500
+        result = cached_forecasts([data], start, with_std=bool(data.get('return_std')))[0]
+        response = {
             'status': 'success',
-            'predictions': predictions.tolist(),
+            'predictions': result['predictions'],
             'used_time': {
                 'Month': month,
                 'Day': day
             }
-        }), 200
+        }
+
+        if data.get('return_std'):
+            response.update(uncertainty_fields(result))
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
+
+@energy_prediction_bp.route('/predict_energy_consumption/batch', methods=['POST'])
+@require_session
+def predict_energy_consumption_batch():
+    try:
+        reload_if_published()
+        if predictor is None:
+            return jsonify({'error': 'Model, scaler, or poly transformer not loaded'}), 500
+
+        data = request.get_json()
+        if not data or not data.get('homes'):
+            return jsonify({'error': 'No homes provided'}), 400
+
+        homes = data['homes']
+        if not isinstance(homes, dict):
+            return jsonify({'error': 'homes must map each home id to its forecast'}), 400
+
+        required_fields = ['temperatures', 'humidities', 'winds']
+        for home_id, forecast in homes.items():
+            if not isinstance(forecast, dict) or not all(field in forecast for field in required_fields):
+                return jsonify({'error': f'Home {home_id} is missing required fields: {", ".join(required_fields)}'}), 400
+            error = forecast_error(forecast)
+            if error:
+                return jsonify({'error': f'Home {home_id}: {error}'}), 400
+
+            horizon = len(forecast['temperatures'])
+            if horizon == 0 or not (horizon == len(forecast['humidities']) == len(forecast['winds'])):
+                return jsonify({'error': f'Home {home_id}: temperatures, humidities, and winds must be non-empty and of equal length'}), 400
+
+        # Forecasts start at midnight today; horizons past 24 hours roll over into the following days.
+        # Homes sharing a forecast hit the cache; the rest are predicted in one stacked call
+        start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        if data.get('return_std') and not uncertainty_available():
+            return jsonify({'error': 'Loaded model has no uncertainty terms; re-run model_train.py'}), 500
+        results = dict(zip(homes, cached_forecasts(list(homes.values()), start, with_std=bool(data.get('return_std')))))
+        response = {
+            'status': 'success',
+            'predictions': {home_id: result['predictions'] for home_id, result in results.items()},
+            'used_time': {
+                'Month': start.month,
+                'Day': start.day
+            }
+        }
+
+        if data.get('return_std'):
+            fields = {home_id: uncertainty_fields(result) for home_id, result in results.items()}
+            response.update({name: {home_id: fields[home_id][name] for home_id in fields} for name in ('std', 'lower', 'upper')})
+
+        return jsonify(response), 200
 
     except Exception as e:
-        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Prediction failed: {str(e)}'}), 500
@@ -0,0 +1,29 @@
+from flask import Blueprint, request, jsonify
+from db import connection
+from db.state_history import hourly_consumption, parse_range
+from utils.session_tokens import require_session, session_allows
+
+history_bp = Blueprint("history", __name__)
+
+# Per-hour consumption history for a user over a date range (ISO-8601 start/end, default last 24 hours)
+@history_bp.route("/history", methods=["GET"])
+@require_session
+def get_history():
+    email = request.args.get("email")
+    if not email:
+        return jsonify({"message": "Email is required"}), 400
+    if not session_allows(email):
+        return jsonify({"message": "Session does not match this user"}), 403
+
+    try:
+        start, end = parse_range(request.args.get("start"), request.args.get("end"))
+    except ValueError as ve:
+        return jsonify({"message": f"Invalid date range: {str(ve)}"}), 400
+
+    if start >= end:
+        return jsonify({"message": "start must be before end"}), 400
+
+    hours = hourly_consumption(connection.history_collection, email, start, end)
+    for hour in hours:
+        hour["hour"] = hour["hour"].isoformat()
+    return jsonify({"email": email, "start": start.isoformat(), "end": end.isoformat(), "hours": hours}), 200
@@ -1,26 +1,79 @@
-import pandas as pd
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.multioutput import MultiOutputClassifier
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from flask import Blueprint, request, jsonify, g
+from db.precomputed import request_row
+from ml.appliance_model import get_appliance_model, features
+from utils.metrics import stage
+from utils.session_tokens import require_session
 
 optimize_bp = Blueprint('optimize', __name__)
 
-# Load and prepare data
-df = pd.read_csv('static/powerconsumption_with_appliances.csv', parse_dates=['Datetime'])
-df['Day'] = df['Datetime'].dt.day
-df['Month'] = df['Datetime'].dt.month
-df['Hour'] = df['Datetime'].dt.hour
+# Appliances the optimizer makes suggestions for (Fridge is excluded since it's always ON)
+suggested_appliances = ['TV', 'AC', 'Oven', 'Fan', 'Light']
 
-features = ['Day', 'Month', 'Hour', 'Temperature', 'Humidity', 'WindSpeed']
-X = df[features]
-y = df[['TV', 'AC', 'Oven', 'Fan', 'Light']]  # Exclude Fridge since it's always ON
+# Validate one home's conditions and current states; returns an error message or None
+def validate_home(data):
+    if not all(field in data for field in features):
+        return 'Missing required fields: ' + ', '.join(set(features) - set(data))
+    return validate_states(data)
 
-# Train model
-base_tree = DecisionTreeClassifier(max_depth=4, random_state=42)
-multi_output_tree = MultiOutputClassifier(base_tree)
-multi_output_tree.fit(X, y)
+# Validate the (optional) current appliance states; returns an error message or None
+def validate_states(data):
+    current_states = data.get('current_states', {})
+    if not isinstance(current_states, dict):
+        return 'current_states must be an object mapping appliance names to 0 (OFF) or 1 (ON)'
+    valid_appliances = suggested_appliances + ['Fridge']
+    if current_states and not all(appliance in valid_appliances for appliance in current_states):
+        return 'Invalid appliance in current_states: ' + ', '.join(set(current_states) - set(valid_appliances))
+
+    # Validate current_states values (must be 0 or 1)
+    for appliance, state in current_states.items():
+        if state not in [0, 1]:
+            return f'Invalid state for {appliance}: must be 0 (OFF) or 1 (ON)'
+    return None
+
+# Compare predicted ideal states with the current ones
+def build_suggestions(predicted, current_states):
+    suggestions = []
+    for appliance in suggested_appliances:
+        predicted_state = predicted[appliance]
+        # Get current state (default to OFF if not provided)
+        current_state = current_states.get(appliance, 0)
+
+        if current_state == 1 and predicted_state == 0:
+            suggestions.append(f"Turn OFF {appliance}")
+        elif current_state == 0 and predicted_state == 1:
+            suggestions.append(f"Turn ON {appliance}")
+
+    # Handle Fridge (always ON, no suggestions to turn it off)
+    if 'Fridge' in current_states and current_states['Fridge'] == 0:
+        suggestions.append("Turn ON Fridge")  # Suggest turning on if Fridge is OFF
+    return suggestions
+
+# Whether the conditions a request sends (if any) are the ones a precomputed row has for the hour:
+# its local date and its forecast, to the 0.1 the forecast is reported in
+def matches_row(data, row, hour):
+    date = datetime.strptime(row['date'], '%Y-%m-%d')
+    forecast = row['forecast']
+    expected = {
+        'Day': date.day,
+        'Month': date.month,
+        'Temperature': forecast['temperatures'][hour],
+        'Humidity': forecast['humidities'][hour],
+        'WindSpeed': forecast['winds'][hour]
+    }
+    try:
+        return all(round(float(data[field]), 1) == round(float(value), 1) for field, value in expected.items() if field in data)
+    except (TypeError, ValueError):
+        return False
+
+def suggestions_payload(suggestions):
+    if suggestions:
+        return {'suggestions': suggestions}
+    return {'suggestions': [], 'message': 'All appliances are in their predicted states.'}
 
 @optimize_bp.route('/optimize', methods=['POST'])
+@require_session
 def generate_appliance_suggestions():
     try:
         if not request.data:
@@ -30,51 +83,77 @@ def generate_appliance_suggestions():
             return jsonify({'error': 'Content-Type must be application/json'}), 400
 
         data = request.get_json()
-        required_fields = ['Day', 'Month', 'Hour', 'Temperature', 'Humidity', 'WindSpeed']
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields: ' + ', '.join(set(required_fields) - set(data))}), 400
-        
-        # Extract current appliance states (optional)
-        current_states = data.get('current_states', {})
-        valid_appliances = list(y.columns) + ['Fridge']
-        if current_states and not all(appliance in valid_appliances for appliance in current_states):
-            return jsonify({'error': 'Invalid appliance in current_states: ' + ', '.join(set(current_states) - set(valid_appliances))}), 400
-        
-        # Validate current_states values (must be 0 or 1)
-        for appliance, state in current_states.items():
-            if state not in [0, 1]:
-                return jsonify({'error': f'Invalid state for {appliance}: must be 0 (OFF) or 1 (ON)'}), 400
-        
-        # Prepare input data for prediction
-        input_data = pd.DataFrame([[data['Day'], data['Month'], data['Hour'], 
-                                    data['Temperature'], data['Humidity'], data['WindSpeed']]],
-                                  columns=features)
-        
-        # Predict ideal states
-        prediction = multi_output_tree.predict(input_data)[0]
-        
-        # Generate suggestions
-        suggestions = []
-        for appliance, predicted_state in zip(y.columns, prediction):
-            # Get current state (default to OFF if not provided)
-            current_state = current_states.get(appliance, 0)
-            
-            if current_state == 1 and predicted_state == 0:
-                suggestions.append(f"Turn OFF {appliance}")
-            elif current_state == 0 and predicted_state == 1:
-                suggestions.append(f"Turn ON {appliance}")
-        
-        # Handle Fridge (always ON, no suggestions to turn it off)
-        if 'Fridge' in current_states and current_states['Fridge'] == 0:
-            suggestions.append("Turn ON Fridge")  # Suggest turning on if Fridge is OFF
-        
-        # Return response
-        if suggestions:
-            return jsonify({'suggestions': suggestions}), 200
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Conditions must be an object'}), 400
+        region = data.get('region')
+        if region is not None and not isinstance(region, str):
+            return jsonify({'error': 'region must be a string'}), 400
+
+        # Ideal states for the hour from today's precomputed row for the region (from the request, or
+        # the signed-in user's profile), when the request sends no conditions or the row's own; the
+        # trees are only walked here for other conditions or when there is no row
+        row = request_row(region, g.session_email)
+        if row is not None:
+            hour = data.get('Hour')
+            if hour is None:
+                hour = datetime.now(ZoneInfo(row['timezone'])).hour
+            if isinstance(hour, bool) or not isinstance(hour, int) or not 0 <= hour <= 23:
+                return jsonify({'error': 'Hour must be between 0 and 23'}), 400
+            if not matches_row(data, row, hour):
+                row = None
+        if row is not None:
+            error = validate_states(data)
+            if error:
+                return jsonify({'error': error}), 400
+            predicted = {appliance: states[hour] for appliance, states in row['ideal_states'].items()}
         else:
-            return jsonify({'suggestions': [], 'message': 'All appliances are in their predicted states.'}), 200
+            error = validate_home(data)
+            if error:
+                return jsonify({'error': error}), 400
+
+            # Predict ideal states by walking the flattened trees (loaded on first use)
+            evaluator = get_appliance_model()['evaluator']
+            with stage("tree_predict"):
+                predicted = evaluator.predict([data[field] for field in features])
+
+        suggestions = build_suggestions(predicted, data.get('current_states', {}))
+        return jsonify(suggestions_payload(suggestions)), 200
+
+    except ValueError as ve:
+        return jsonify({'error': f'Invalid JSON format: {str(ve)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@optimize_bp.route('/optimize/batch', methods=['POST'])
+@require_session
+def generate_appliance_suggestions_batch():
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Content-Type must be application/json'}), 400
+
+        data = request.get_json()
+        homes = data.get('homes') if isinstance(data, dict) else None
+        if not homes or not isinstance(homes, dict):
+            return jsonify({'error': 'homes must map each home id to its conditions'}), 400
+
+        for home_id, home in homes.items():
+            error = validate_home(home) if isinstance(home, dict) else 'Conditions must be an object'
+            if error:
+                return jsonify({'error': f'Home {home_id}: {error}'}), 400
+
+        # One vectorized walk over the trees for every home
+        evaluator = get_appliance_model()['evaluator']
+        home_ids = list(homes)
+        with stage("tree_predict_batch"):
+            states = evaluator.predict_batch([[homes[home_id][field] for field in features] for home_id in home_ids])
+
+        results = {}
+        for home_id, row in zip(home_ids, states.tolist()):
+            predicted = dict(zip(evaluator.names, row))
+            results[home_id] = suggestions_payload(build_suggestions(predicted, homes[home_id].get('current_states', {})))
+        return jsonify({'results': results}), 200
 
     except ValueError as ve:
         return jsonify({'error': f'Invalid JSON format: {str(ve)}'}), 400
     except Exception as e:
-        return jsonify({'error': f'Server error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
@@ -0,0 +1,71 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from flask import Blueprint, request, jsonify
+from db.precomputed import recent_runs, todays_row
+from db.users import get_user_record
+from routes.optimize import build_suggestions, suggestions_payload
+from utils.session_tokens import require_admin, require_session, session_allows
+
+precomputed_bp = Blueprint("precomputed", __name__)
+
+# Region from ?region= or from the user's profile (?email=); returns (region, user, error response)
+def resolve_region():
+    email = request.args.get("email")
+    user = None
+    if email:
+        if not session_allows(email):
+            return None, None, (jsonify({"message": "Session does not match this user"}), 403)
+        user = get_user_record(email)
+        if user is None:
+            return None, None, (jsonify({"message": "User not found"}), 404)
+    region = request.args.get("region") or (user or {}).get("region")
+    if not region:
+        return None, None, (jsonify({"message": "Region is required (pass region, or email of a user with a region)"}), 400)
+    return region, user, None
+
+# Day-ahead consumption forecast and hourly ideal appliance states for a region
+@precomputed_bp.route("/precomputed/forecast", methods=["GET"])
+@require_session
+def precomputed_forecast():
+    region, _, error = resolve_region()
+    if error:
+        return error
+
+    row = todays_row(region)
+    if row is None:
+        return jsonify({"message": f"No precomputed forecast for {region} today"}), 404
+    return jsonify({**row, "generated_at": row["generated_at"].isoformat()}), 200
+
+# Suggestions for a user at an hour (default: the current local hour), from the precomputed
+# ideal states and the user's saved appliance states
+@precomputed_bp.route("/precomputed/suggestions", methods=["GET"])
+@require_session
+def precomputed_suggestions():
+    if not request.args.get("email"):
+        return jsonify({"message": "Email is required"}), 400
+    region, user, error = resolve_region()
+    if error:
+        return error
+
+    row = todays_row(region)
+    if row is None:
+        return jsonify({"message": f"No precomputed forecast for {region} today"}), 404
+
+    hour = request.args.get("hour", type=int)
+    if hour is None:
+        hour = datetime.now(ZoneInfo(row["timezone"])).hour
+    if not 0 <= hour <= 23:
+        return jsonify({"message": "hour must be between 0 and 23"}), 400
+
+    predicted = {appliance: states[hour] for appliance, states in row["ideal_states"].items()}
+    current_states = {appliance: user.get(appliance, 0) for appliance in row["ideal_states"]}
+    return jsonify({"region": region, "hour": hour, **suggestions_payload(build_suggestions(predicted, current_states))}), 200
+
+# Timing stats of the most recent precompute runs
+@precomputed_bp.route("/precomputed/runs", methods=["GET"])
+@require_admin
+def precompute_runs():
+    runs = recent_runs(limit=request.args.get("limit", default=24, type=int))
+    for run in runs:
+        run["started_at"] = run["started_at"].isoformat()
+    return jsonify({"runs": runs}), 200
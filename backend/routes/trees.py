@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+from flask import Blueprint, jsonify, send_file
+from ml.appliance_model import get_appliance_model
+from ml.tree_render import artifact_hashes, is_rendered, mimetypes, output_path, render_appliance
+
+trees_bp = Blueprint("trees", __name__)
+
+# Tree hashes of the deployed model, recomputed only when the model's data hash changes
+_hashes = {"data_hash": None, "trees": {}}
+_render_lock = threading.Lock()
+
+# Seconds before a failed on-demand render (e.g. Graphviz missing) is attempted again; until then
+# requests for that image get a 503 straight away
+RENDER_RETRY_SECONDS = float(os.getenv("TREE_RENDER_RETRY_SECONDS", "60"))
+_render_failures = {}  # (hash, format) -> time.monotonic() of the last failure
+
+def deployed_hashes():
+    artifact = get_appliance_model()
+    if _hashes["data_hash"] != artifact["data_hash"]:
+        _hashes["trees"] = artifact_hashes(artifact)
+        _hashes["data_hash"] = artifact["data_hash"]
+    return artifact, _hashes["trees"]
+
+# Hash and ETag of each appliance's tree, with the URLs of its rendered images
+@trees_bp.route("/trees", methods=["GET"])
+def list_trees():
+    _, hashes = deployed_hashes()
+    return jsonify({"trees": {
+        appliance: {"hash": digest, "urls": {fmt: f"/trees/{appliance}.{fmt}" for fmt in mimetypes}}
+        for appliance, digest in hashes.items()
+    }}), 200
+
+# Seconds until a recently failed render may be retried, or 0 when it may be retried now
+def retry_after(digest, fmt):
+    failed_at = _render_failures.get((digest, fmt))
+    if failed_at is None:
+        return 0
+    return max(0, RENDER_RETRY_SECONDS - (time.monotonic() - failed_at))
+
+def render_unavailable(appliance, fmt, seconds):
+    response = jsonify({"message": f"Could not render the {appliance} tree as {fmt} (is Graphviz installed?)"})
+    response.headers["Retry-After"] = str(max(1, int(seconds + 0.999)))
+    return response, 503
+
+# Rendered tree of the deployed model. The ETag is the tree's content hash, so clients revalidate
+# with If-None-Match and get a 304 until the model actually changes. A missing render (e.g. right
+# after a retrain) is produced on demand, for the requested tree only.
+@trees_bp.route("/trees/<appliance>.<fmt>", methods=["GET"])
+def get_tree(appliance, fmt):
+    if fmt not in mimetypes:
+        return jsonify({"message": f"Unsupported format {fmt}; choose from {', '.join(mimetypes)}"}), 400
+    artifact, hashes = deployed_hashes()
+    digest = hashes.get(appliance)
+    if digest is None:
+        return jsonify({"message": f"Unknown appliance {appliance}"}), 404
+
+    fmts = () if fmt == "dot" else (fmt,)
+    if not is_rendered(digest, fmts):
+        wait = retry_after(digest, fmt)
+        if wait:
+            return render_unavailable(appliance, fmt, wait)
+        with _render_lock:
+            # Requests that queued behind a failed render do not repeat it
+            wait = retry_after(digest, fmt)
+            if wait:
+                return render_unavailable(appliance, fmt, wait)
+            if not is_rendered(digest, fmts):
+                try:
+                    render_appliance(artifact, appliance, fmts)
+                    _render_failures.pop((digest, fmt), None)
+                except Exception as e:
+                    print(f"❌ Failed to render {appliance} tree: {e}")
+                    _render_failures[(digest, fmt)] = time.monotonic()
+                    return render_unavailable(appliance, fmt, RENDER_RETRY_SECONDS)
+
+    response = send_file(os.path.abspath(output_path(digest, fmt)), mimetype=mimetypes[fmt], etag=digest, conditional=True)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
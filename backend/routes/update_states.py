@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
-from db.connection import users_collection
+from db.users import save_appliance_states
+from db.state_history import state_event
+from utils.metrics import stage
+from utils.session_tokens import require_session, session_allows
 
 update_states_bp = Blueprint("update_states", __name__)
 
 # Appliance update route
 @update_states_bp.route("/update", methods=["POST"])
+@require_session
 def update_appliances():
     data = request.get_json()
     email = data.get("email")
@@ -15,16 +19,17 @@ def update_appliances():
 
     if not email or appliance_states is None:
         return jsonify({"message": "Email or appliances data missing"}), 400
+    if not session_allows(email):
+        return jsonify({"message": "Session does not match this user"}), 403
 
     # Convert list to a dictionary like {"TV": 0, "AC": 1, ...}
     updates = {appliances[i]: state for i, state in enumerate(appliance_states)}
 
-    result = users_collection.update_one(
-        {"email": email},
-        {"$set": {**updates, "total": total_consumption}}
-    )
+    # Queued for the background bulk writer; repeated saves for the same user are coalesced,
+    # while every save is still recorded in the state history
+    with stage("state_enqueue"):
+        queued = save_appliance_states(email, {**updates, "total": total_consumption}, event=state_event(appliance_states, total_consumption))
+    if not queued:
+        return jsonify({"message": "Too many pending updates, please retry shortly"}), 503
 
-    if result.matched_count == 0:
-        return jsonify({"message": "User not found"}), 404
-
-    return jsonify({"message": "Appliance states updated successfully!"}), 200
+    return jsonify({"message": "Appliance states updated successfully!"}), 202
@@ -0,0 +1,138 @@
+# Pre-fork production server. The master imports the app (compiled energy predictor), loads or
+# trains the appliance trees and binds the listening socket once, then forks workers that share the
+# loaded models copy-on-write and accept on the same socket. Each worker is a threaded WSGI server,
+# so Mongo-bound requests (/api/login, /api/signup, /update) wait on their own thread instead of
+# holding up CPU-bound predictions; password hashing runs in each worker's process pool and /update
+# only enqueues into the write-behind buffer. The master closes its MongoClient (used for index
+# setup) before forking and every worker opens its own, since clients are not fork-safe. HASH_WORKERS
+# is the hashing budget of the whole server, split between the workers, and /metrics merges every
+# worker's metrics through METRICS_DIR (a temporary directory unless set). Each worker caches user
+# records in memory, so invalidations are shared through a SQLite log (in a temporary directory
+# unless USER_CACHE_INVALIDATION_PATH is set) for a write on one worker to reach the others.
+# Run from backend/: python serve.py [--workers N] [--host 0.0.0.0] [--port 9000]
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from werkzeug.serving import make_server
+
+def load_app():
+    from app import app
+    from ml.appliance_model import get_appliance_model
+    get_appliance_model()
+    return app
+
+# Runs in each forked worker: restart per-process helpers, then serve until told to stop
+def run_worker(server, hash_workers):
+    from db import connection
+    from utils import metrics
+    from utils.password_pool import password_pool
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the master, which stops the workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    connection.reconnect()
+    password_pool.resize(hash_workers)
+    password_pool.warm()
+    if os.getenv("METRICS_PROFILER", "0") == "1":
+        metrics.profiler.start()  # the master's sampling thread did not survive the fork
+
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        # The write-behind worker restarts lazily in this process; flush whatever it still holds
+        connection.state_writes.close()
+        password_pool.close()
+        metrics.write_snapshot()
+        os._exit(0)
+
+def spawn(server, hash_workers):
+    pid = os.fork()
+    if pid == 0:
+        run_worker(server, hash_workers)
+    return pid
+
+def serve(app, host, port, workers):
+    from db import connection, users
+    from utils import metrics
+    from utils.password_pool import password_pool
+
+    # Per-request access lines cost more than the prediction itself; opt back in with SERVE_ACCESS_LOG=1
+    if os.getenv("SERVE_ACCESS_LOG", "0") != "1":
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, app, threaded=True)
+    print(f"🚀 Serving on http://{host}:{server.server_port} with {workers} workers (master pid {os.getpid()})")
+
+    # Index setup is done; workers open their own clients
+    connection.client.close()
+
+    # Each worker writes its metrics here for /metrics to merge; files of an earlier run are stale
+    created_metrics_dir = metrics.metrics_dir is None
+    if created_metrics_dir:
+        metrics.metrics_dir = tempfile.mkdtemp(prefix="fam-metrics-")
+    for filename in os.listdir(metrics.metrics_dir):
+        if filename.endswith(".json"):
+            os.remove(os.path.join(metrics.metrics_dir, filename))
+
+    # A write handled by one worker must drop the cached user record in all of them
+    invalidation_dir = None
+    if users.invalidation_log is None and workers > 1:
+        invalidation_dir = tempfile.mkdtemp(prefix="fam-users-")
+        users.share_invalidations(os.path.join(invalidation_dir, "invalidations.sqlite"))
+
+    # Split the server-wide hashing budget (HASH_WORKERS) so workers don't oversubscribe the CPU
+    hash_workers = max(1, password_pool.workers // workers) if password_pool.workers > 0 else 0
+
+    # Keep the loaded models out of the collector's reach so forked workers don't copy their pages
+    gc.collect()
+    gc.freeze()
+
+    children = {spawn(server, hash_workers) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Replace workers that die until asked to stop
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"❌ Worker {pid} exited ({status}), starting a replacement")
+            time.sleep(0.5)
+            children.add(spawn(server, hash_workers))
+    server.server_close()
+    if created_metrics_dir:
+        shutil.rmtree(metrics.metrics_dir, ignore_errors=True)
+    if invalidation_dir:
+        shutil.rmtree(invalidation_dir, ignore_errors=True)
+    print("✅ All workers stopped.")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default=os.getenv("SERVE_HOST", "127.0.0.1"))
+    parser.add_argument('--port', type=int, default=int(os.getenv("SERVE_PORT", "9000")))
+    parser.add_argument('--workers', type=int, default=int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1))))
+    args = parser.parse_args()
+    serve(load_app(), args.host, args.port, args.workers)
+
+if __name__ == "__main__":
+    main()
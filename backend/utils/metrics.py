@@ -0,0 +1,255 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from flask import Response, g, request
+from utils.session_tokens import require_admin
+
+# Histogram upper bounds in seconds, spanning cache hits (~100 µs) to slow Mongo round trips
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Prometheus-style cumulative histograms, one series per label tuple
+class Histogram:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds):
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(BUCKETS) + 2)
+            if index < len(BUCKETS):
+                series[index] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    # Render this histogram, or a merged snapshot of it from several processes
+    def render(self, snapshot=None):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        if snapshot is None:
+            snapshot = self.snapshot()
+        for labels, series in sorted(snapshot.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(BUCKETS, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+request_latency = Histogram("fam_request_duration_seconds", "Request latency by route.", ("route", "method", "status"))
+stage_latency = Histogram("fam_stage_duration_seconds", "Latency of internal hot-path stages.", ("stage",))
+
+# Callbacks returning the current value of a counter or gauge, sampled at scrape time
+_samples = []
+
+def register_sample(name, kind, help_text, fn):
+    _samples.append((name, kind, help_text, fn))
+
+# Time one stage of a request: `with stage("features"): ...`
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe((name,), time.perf_counter() - start)
+
+def _sample_values():
+    values = {}
+    for name, kind, help_text, fn in _samples:
+        try:
+            values[name] = fn()
+        except Exception:
+            continue
+    return values
+
+# Render from this process's state, or from merged multi-process state
+def render_metrics(histograms=None, values=None):
+    values = _sample_values() if values is None else values
+    lines = []
+    for histogram in (request_latency, stage_latency):
+        lines += histogram.render(None if histograms is None else histograms.get(histogram.name, {}))
+    for name, kind, help_text, fn in _samples:
+        if name in values:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {values[name]}"]
+    return "\n".join(lines) + "\n"
+
+# --- Multi-process aggregation ---
+# Under the pre-fork server each worker has its own histograms and counters. When METRICS_DIR is
+# set (serve.py sets it), every process writes its state to <METRICS_DIR>/<pid>.json about once a
+# second and whenever it answers a scrape, and /metrics merges all the files. Histograms and
+# counters of exited workers are kept so totals never go backwards; gauges only count live workers.
+metrics_dir = os.getenv("METRICS_DIR")
+DUMP_INTERVAL = 1.0
+_exporter_pid = None
+
+def write_snapshot():
+    if not metrics_dir:
+        return
+    state = {
+        "pid": os.getpid(),
+        "histograms": {histogram.name: [[list(labels), series] for labels, series in histogram.snapshot().items()]
+                       for histogram in (request_latency, stage_latency)},
+        "values": _sample_values()
+    }
+    path = os.path.join(metrics_dir, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def merged_state():
+    histograms, values = {}, {}
+    kinds = {name: kind for name, kind, _, _ in _samples}
+    for filename in os.listdir(metrics_dir):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(metrics_dir, filename)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, series_list in state["histograms"].items():
+            merged = histograms.setdefault(name, {})
+            for labels, series in series_list:
+                labels = tuple(labels)
+                if labels in merged:
+                    merged[labels] = [a + b for a, b in zip(merged[labels], series)]
+                else:
+                    merged[labels] = series
+        live = _alive(state["pid"])
+        for name, value in state["values"].items():
+            if kinds.get(name) == "gauge" and not live:
+                continue
+            values[name] = values.get(name, 0) + value
+    return histograms, values
+
+# Background thread writing this process's snapshot; started lazily, and again in forked children
+def _ensure_exporter():
+    global _exporter_pid
+    if not metrics_dir or _exporter_pid == os.getpid():
+        return
+    _exporter_pid = os.getpid()
+
+    def export():
+        while True:
+            time.sleep(DUMP_INTERVAL)
+            try:
+                write_snapshot()
+            except OSError:
+                pass
+    threading.Thread(target=export, name="metrics-exporter", daemon=True).start()
+
+# Samples every thread's stack at a fixed interval and counts folded stacks
+# ("outer;inner;leaf N", the flamegraph.pl input format). Only runs when started.
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+    def reset(self):
+        self.stacks.clear()
+        self.samples = 0
+
+profiler = SamplingProfiler(interval=float(os.getenv("PROFILER_INTERVAL_MS", "5")) / 1000)
+
+# Hook request timing into the app and expose /metrics (and /metrics/profile when profiling),
+# both limited to ADMIN_TOKEN holders (or localhost with METRICS_ALLOW_LOCALHOST=1)
+def init_app(app):
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        # Parse JSON bodies up front so parsing is timed once for every route (the result is cached)
+        if request.is_json:
+            with stage("json_parse"):
+                request.get_json(silent=True)
+
+    @app.after_request
+    def record_latency(response):
+        start = g.get("request_start")
+        if start is not None and request.url_rule is not None:
+            request_latency.observe((request.url_rule.rule, request.method, str(response.status_code)), time.perf_counter() - start)
+        _ensure_exporter()
+        return response
+
+    # Whole-server metrics when several processes share METRICS_DIR, this process's otherwise
+    @app.route("/metrics", methods=["GET"])
+    @require_admin
+    def metrics():
+        if metrics_dir:
+            write_snapshot()
+            body = render_metrics(*merged_state())
+        else:
+            body = render_metrics()
+        return Response(body, mimetype="text/plain; version=0.0.4")
+
+    # Folded stacks of the process that answers; profiles are per worker and not merged (the
+    # X-Worker-Pid header says which one was sampled)
+    @app.route("/metrics/profile", methods=["GET"])
+    @require_admin
+    def metrics_profile():
+        if profiler._thread is None:
+            return Response("Sampling profiler is off; start the server with METRICS_PROFILER=1\n", status=404, mimetype="text/plain")
+        body = profiler.folded()
+        if request.args.get("reset"):
+            profiler.reset()
+        return Response(body, mimetype="text/plain", headers={"X-Worker-Pid": str(os.getpid())})
+
+    if os.getenv("METRICS_PROFILER", "0") == "1":
+        profiler.start()
+        print(f"🔬 Sampling profiler running every {profiler.interval * 1000:g} ms")
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Raised when every worker is busy and the wait queue is full; callers answer 503 right away
+class PoolSaturated(Exception):
+    pass
+
+# Raised when a hash takes longer than the pool's timeout; also answered with 503
+class HashTimeout(PoolSaturated):
+    pass
+
+# Hash workers start from a fork server (spawn where there is none) instead of forking the
+# calling process, so they never inherit the app's Mongo client, sockets or threads
+def _mp_context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['werkzeug.security'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+# Runs CPU-bound password hashing in worker processes so it cannot starve request threads.
+# At most `workers + max_queue` hash jobs are admitted at once; anything beyond is rejected.
+class HashingPool:
+    def __init__(self, workers, max_queue, timeout=10.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_queue) if workers > 0 else None
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    # Create the executor lazily, and again in forked children (a pool cannot be shared across fork)
+    def _get_executor(self):
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        # workers = 0 keeps hashing inline on the request thread
+        if self._slots is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the job finishes, even when the caller stops waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()  # frees the slot right away if the job has not started yet
+            raise HashTimeout()
+
+    # Change the number of hash workers; only before this process has started its pool
+    def resize(self, workers):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + self.max_queue) if workers > 0 else None
+
+    # Start every hash worker now, so the first logins don't pay for process startup
+    def warm(self):
+        if self._slots is not None:
+            for future in [self._get_executor().submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    # Stop this process's hash workers (each forked server worker owns its own pool)
+    def close(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
+
+    def hash_password(self, password):
+        return self._run(generate_password_hash, password)
+
+    def check_password(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+password_pool = HashingPool(
+    workers=int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2)))),
+    max_queue=int(os.getenv("HASH_QUEUE_DEPTH", "32")),
+    timeout=float(os.getenv("HASH_TIMEOUT", "10"))
+)
@@ -0,0 +1,93 @@
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from flask import g, jsonify, request
+
+# Signing key shared by every worker. Without SESSION_SECRET a random key is generated at import,
+# which forked workers inherit, but tokens then stop validating after a restart.
+_secret = os.getenv("SESSION_SECRET")
+if not _secret:
+    print("⚠️ SESSION_SECRET not set, using a random per-process session key.")
+    _secret = secrets.token_hex(32)
+_secret = _secret.encode()
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(12 * 3600)))
+
+# When set, routes protected by require_session reject requests without a token
+REQUIRE_SESSION = os.getenv("REQUIRE_SESSION", "0") == "1"
+
+# Bearer token for operational endpoints (/metrics, cache and precompute stats). Without one they
+# are closed, unless METRICS_ALLOW_LOCALHOST=1 opens them to clients on the local machine; only
+# set that when no reverse proxy on the same host forwards outside requests, which would all
+# appear to come from localhost.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+ALLOW_LOCALHOST = os.getenv("METRICS_ALLOW_LOCALHOST", "0") == "1"
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload):
+    return _b64encode(hmac.new(_secret, payload.encode(), hashlib.sha256).digest())
+
+# Token of the form <base64 payload>.<base64 HMAC-SHA256>, payload {"email", "exp"}
+def issue_token(email, ttl=SESSION_TTL):
+    payload = _b64encode(json.dumps({"email": email, "exp": int(time.time()) + ttl}, separators=(",", ":")).encode())
+    return f"{payload}.{_sign(payload)}"
+
+# Email the token was issued for, or None if it is malformed, forged or expired
+def verify_token(token):
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims.get("email")
+
+# Authenticate a route with the Bearer session token (an HMAC check, no database lookup).
+# The verified email is exposed as g.session_email; a bad token is always rejected, a missing
+# one only when REQUIRE_SESSION is on.
+def require_session(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get("Authorization", "")
+        g.session_email = None
+        if header.startswith("Bearer "):
+            g.session_email = verify_token(header[len("Bearer "):])
+            if g.session_email is None:
+                return jsonify({"message": "Invalid or expired session"}), 401
+        elif REQUIRE_SESSION:
+            return jsonify({"message": "Authentication required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+# Whether the authenticated session (if any) may act for `email`
+def session_allows(email):
+    return g.get("session_email") is None or g.session_email == email
+
+# Restrict an operational route to holders of ADMIN_TOKEN, or to localhost when none is configured
+# and METRICS_ALLOW_LOCALHOST is on
+def require_admin(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            header = request.headers.get("Authorization", "")
+            if not hmac.compare_digest(header.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+                return jsonify({"message": "Admin token required"}), 401
+        elif not ALLOW_LOCALHOST:
+            return jsonify({"message": "Set ADMIN_TOKEN (or METRICS_ALLOW_LOCALHOST=1) to enable this endpoint"}), 403
+        elif request.remote_addr not in ("127.0.0.1", "::1"):
+            return jsonify({"message": "Only available from localhost unless ADMIN_TOKEN is set"}), 403
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,148 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cache stored in a SQLite file so several worker processes (or hosts on a shared volume) reuse
+# each other's entries. Values must be JSON-serializable. Expired rows are skipped on read and
+# pruned, together with the oldest rows beyond `maxsize`, every `prune_every` writes. Hit/miss
+# counters live in the file too, so they cover every process; each process adds its counts in
+# batches of `stats_every` lookups (or once a second) rather than writing on every read.
+class SQLiteCache:
+    def __init__(self, path, maxsize=100000, ttl=900.0, prune_every=500, stats_every=100):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self.stats_every = stats_every
+        self._writes = 0
+        self._counts = {"hits": 0, "misses": 0}  # not yet added to the shared counters
+        self._counts_pid = os.getpid()
+        self._counts_flushed_at = time.monotonic()
+        self._counts_lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    # One connection per thread and per process (connections must not cross a fork)
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return default
+        self._count("hits")
+        return json.loads(row[0])
+
+    def _count(self, name):
+        with self._counts_lock:
+            if self._counts_pid != os.getpid():
+                # Forked child: the parent adds its own pending counts
+                self._counts, self._counts_pid = {"hits": 0, "misses": 0}, os.getpid()
+            self._counts[name] += 1
+            due = sum(self._counts.values()) >= self.stats_every or time.monotonic() - self._counts_flushed_at >= 1.0
+        if due:
+            self.flush_stats()
+
+    # Add this process's pending hit/miss counts to the shared counters
+    def flush_stats(self):
+        with self._counts_lock:
+            counts = [(name, value) for name, value in self._counts.items() if value]
+            self._counts = {"hits": 0, "misses": 0}
+            self._counts_flushed_at = time.monotonic()
+        if counts:
+            self._connection().executemany(
+                "INSERT INTO cache_stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                counts
+            )
+
+    # Hits and misses across every process using this file (other processes' latest counts may
+    # still be pending, by at most stats_every lookups or a second each)
+    def stats(self):
+        self.flush_stats()
+        totals = dict(self._connection().execute("SELECT name, value FROM cache_stats").fetchall())
+        return {"hits": totals.get("hits", 0), "misses": totals.get("misses", 0)}
+
+    def set(self, key, value):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)",
+            (key, time.time() + self.ttl, json.dumps(value, separators=(",", ":")))
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,)
+        )
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+# Append-only log of invalidated keys in a SQLite file, so processes keeping their own in-memory
+# cache can drop entries another process wrote. Each process reads the rows added since its last
+# poll. Rows older than `retention` seconds are pruned; set it above the local caches' TTL, since
+# a process only needs a row while its own entry for that key could still be alive.
+class InvalidationLog:
+    def __init__(self, path, retention=300.0, prune_every=500):
+        self.path = path
+        self.retention = retention
+        self.prune_every = prune_every
+        self._writes = 0
+        self._local = threading.local()
+        self._seen_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, at REAL NOT NULL)")
+        # Earlier rows belong to entries this process never cached
+        self._seen = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0]
+
+    # One connection per thread and per process (connections must not cross a fork)
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def publish(self, key):
+        conn = self._connection()
+        conn.execute("INSERT INTO invalidations (key, at) VALUES (?, ?)", (key, time.time()))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            conn.execute("DELETE FROM invalidations WHERE at < ?", (time.time() - self.retention,))
+
+    # Keys invalidated (by any process, this one included) since the previous poll
+    def poll(self):
+        with self._seen_lock:
+            rows = self._connection().execute("SELECT seq, key FROM invalidations WHERE seq > ?", (self._seen,)).fetchall()
+            if rows:
+                self._seen = rows[-1][0]
+        return [key for _, key in rows]
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Thread-safe LRU cache whose entries also expire after `ttl` seconds
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        # Bumped on invalidate, so a value read from the backing store before an invalidation is
+        # not cached after it. Reset (with a new epoch) when it grows past maxsize keys.
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    # Token to take before reading a value from the backing store and pass to set()
+    def generation(self, key):
+        with self._lock:
+            return (self._epoch, self._generations.get(key, 0))
+
+    # Store a value; with a generation token, only if the key was not invalidated since it was taken
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            if len(self._generations) > self.maxsize:
+                self._generations.clear()
+                self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._epoch += 1
+
+    def __len__(self):
+        return len(self._entries)
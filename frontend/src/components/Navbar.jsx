@@ -50,6 +50,8 @@ const Navbar = () => {
         localStorage.removeItem("Oven");
         localStorage.removeItem("Fan");
         localStorage.removeItem("Light");
+        localStorage.removeItem("sessionToken");
+        localStorage.removeItem("userRegion");
         setUserName("Guest");
         setUserGender("unknown");
         setUserProfileImage(unknown);
@@ -5,6 +5,7 @@ import BuzzerBot from '../components/BuzzerBot';
 import { useSnackbar } from 'notistack';
 import WeatherCard from '../components/WeatherCard';
 import axios from 'axios';
+import { authHeaders } from '../session';
 import {
     FaTv,
     FaSnowflake,
@@ -125,7 +126,7 @@ function Dashboard() {
                 email: userEmail,
                 appliances: switchStates,
                 total: totalConsumption
-            })
+            }, { headers: authHeaders() })
             .then(response => {
                 console.log('Update successful:', response.data);
                 enqueueSnackbar('Settings saved successfully!', { variant: 'success',  autoHideDuration: 1000 });
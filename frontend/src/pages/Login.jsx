@@ -57,7 +57,7 @@ const Login = () => {
                     }, 3000);
                 } else {
                     // Assuming the backend sends user data (firstName, lastName, gender)
-                    const { firstName, lastName, gender, TV, AC, Fridge, Oven, Fan, Light, Total } = result; // Destructure the response
+                    const { firstName, lastName, gender, region, TV, AC, Fridge, Oven, Fan, Light, Total, token } = result; // Destructure the response
     
                     // Store firstName, lastName, gender, and email in localStorage after login
                     localStorage.setItem('userEmail', email);
@@ -72,6 +72,13 @@ const Login = () => {
                     localStorage.setItem('Fan', Fan);  
                     localStorage.setItem('Light', Light); 
                     localStorage.setItem('Total', Total);  
+                    localStorage.setItem('sessionToken', token);
+                    // Weather region, so the forecast and optimizer are served from the precomputed rows
+                    if (region) {
+                        localStorage.setItem('userRegion', region);
+                    } else {
+                        localStorage.removeItem('userRegion');
+                    }
                     console.log('Login successful:', result.message);
                     navigate('/'); // Redirect to home page after login
                 }
@@ -5,6 +5,7 @@ import WeatherCard from '../components/WeatherCard';
 import { useNavigate } from 'react-router-dom';
 import { useSnackbar } from 'notistack';
 import axios from 'axios';
+import { authHeaders } from '../session';
 import tree_AC from '../assets/trees/decision_tree_AC.png';
 import tree_Fan from '../assets/trees/decision_tree_Fan.png';
 import tree_Fridge from '../assets/trees/decision_tree_Fridge.png';
@@ -21,7 +22,7 @@ const applianceNames = [
     { name: 'Light', energy: 0.2 },
 ];
 
-// Map appliance names to their decision tree images
+// Map appliance names to their bundled decision tree images (used when the backend can't serve one)
 const decisionTrees = [
     { name: 'TV', image: tree_TV },
     { name: 'AC', image: tree_AC },
@@ -97,7 +98,7 @@ function Optimizer() {
                     email: userEmail,
                     appliances: switchStates,
                     total: totalConsumption,
-                })
+                }, { headers: authHeaders() })
                 .then((response) => {
                     console.log('Update successful:', response.data);
                     enqueueSnackbar('Settings saved successfully!', { variant: 'success', autoHideDuration: 1000 });
@@ -170,6 +171,8 @@ function Optimizer() {
                         Temperature: temp,
                         Humidity: humid,
                         WindSpeed: wind,
+                        // Ideal states come from today's precomputed row for the region when there is one
+                        region: localStorage.getItem('userRegion') || undefined,
                         current_states: applianceNames.reduce((acc, appliance, index) => {
                             acc[appliance.name] = switchStates[index];
                             return acc;
@@ -179,7 +182,7 @@ function Optimizer() {
                     console.log(payload);
 
                     axios
-                        .post('http://localhost:9000/optimize', payload)
+                        .post('http://localhost:9000/optimize', payload, { headers: authHeaders() })
                         .then((response) => {
                             const suggestions = response.data.suggestions || [];
 
@@ -322,8 +325,14 @@ function Optimizer() {
                                 {/* Carousel */}
                                 <div className="relative w-full h-full flex items-center justify-center pt-4">
                                     {/* Image */}
+                                    {/* Served by the backend for the deployed model (revalidated by ETag); bundled image as fallback */}
                                     <img
-                                        src={decisionTrees[currentTreeIndex].image}
+                                        key={decisionTrees[currentTreeIndex].name}
+                                        src={`http://localhost:9000/trees/${decisionTrees[currentTreeIndex].name}.svg`}
+                                        onError={(e) => {
+                                            e.currentTarget.onerror = null;
+                                            e.currentTarget.src = decisionTrees[currentTreeIndex].image;
+                                        }}
                                         alt={`Decision Tree for ${decisionTrees[currentTreeIndex].name}`}
                                         className="max-w-full p-7 max-h-full object-contain z-10"
                                     />
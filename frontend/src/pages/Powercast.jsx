@@ -6,6 +6,7 @@ import BuzzerBot from '../components/BuzzerBot';
 import WeatherCard from '../components/WeatherCard';
 import { Line } from 'react-chartjs-2';
 import axios from 'axios';
+import { authHeaders } from '../session';
 import { Chart as ChartJS, CategoryScale, LinearScale, Filler, PointElement, LineElement, Title, Tooltip, Legend } from 'chart.js';
 
 // Register Chart.js components
@@ -16,6 +17,7 @@ function Powercast() {
     const navigate = useNavigate();
     const [consumption, setConsumption] = useState(new Array(24).fill(0));
     const [totalAddedConsumption, setTotalAddedConsumption] = useState(new Array(24).fill(0));
+    const [consumptionBand, setConsumptionBand] = useState({ lower: [], upper: [] });
     const currentHour = new Date().getHours();
     const [speech, setSpeech] = useState(
         "Forecast Time! Let’s get a glimpse of your energy future. Together, we’ll plan smarter usage"
@@ -86,13 +88,19 @@ function Powercast() {
                     temperatures: rotatedTemp,
                     humidities: rotatedHumidity,
                     winds: rotatedWind,
-                })
+                    return_std: true,
+                    // Today's precomputed row for the region is served when there is one
+                    region: localStorage.getItem('userRegion') || undefined,
+                }, { headers: authHeaders() })
                 .then((res) => {
                     if (res.data.predictions) {
                         const parsedConsumption = res.data.predictions;
                         setConsumption(parsedConsumption);
                         setTotalAddedConsumption(parsedConsumption.map((value) => value + total));
                     }
+                    if (res.data.lower && res.data.upper) {
+                        setConsumptionBand({ lower: res.data.lower, upper: res.data.upper });
+                    }
                 })
                 .catch((err) => console.error('Prediction error:', err));
 
@@ -136,9 +144,29 @@ function Powercast() {
                     pointHoverBackgroundColor: '#fff',
                     pointHoverBorderColor: 'rgba(54, 162, 235, 1)',
                 },
+                // 95% confidence band around the environment-based prediction
+                {
+                    label: 'Lower bound',
+                    data: consumptionBand.lower,
+                    borderColor: 'transparent',
+                    pointRadius: 0,
+                    fill: false,
+                    tension: 0.4,
+                    isBand: true,
+                },
+                {
+                    label: 'Confidence band (95%)',
+                    data: consumptionBand.upper,
+                    borderColor: 'transparent',
+                    backgroundColor: 'rgba(166, 166, 166, 0.15)',
+                    pointRadius: 0,
+                    fill: '-1',
+                    tension: 0.4,
+                    isBand: true,
+                },
             ],
         }),
-        [consumption, totalAddedConsumption]
+        [consumption, totalAddedConsumption, consumptionBand]
     );
 
     // Get unique consumption values for y-axis ticks (including the new dataset)
@@ -159,6 +187,7 @@ function Powercast() {
                     font: {
                         family: 'Poppins',
                     },
+                    filter: (item) => item.text !== 'Lower bound',
                 },
             },
             title: {
@@ -182,6 +211,7 @@ function Powercast() {
                 },
                 padding: 10,
                 displayColors: false,
+                filter: (tooltipItem) => !tooltipItem.dataset.isBand,
                 backgroundColor: 'rgba(44, 0, 58, 0.8)',
                 cornerRadius: 5,
                 callbacks: {
@@ -0,0 +1,5 @@
+// Session token issued by /api/login, sent as a Bearer header to the protected endpoints
+export const authHeaders = () => {
+    const token = localStorage.getItem('sessionToken');
+    return token ? { Authorization: `Bearer ${token}` } : {};
+};